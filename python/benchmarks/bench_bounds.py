@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Compare the pure Python wrapped longitude bounds search with the vectorised
+GeoJSONGenerator._get_bounds and the chunked BoundsAccumulator (as used by
+NetCDF_Base.geospatial_chunked for arrays too large to read at once).
+
+    python bench_bounds.py [--sizes=<n>,<n>,...] [--chunk=<n>] [--repeat=<n>]
+
+The pure Python search is skipped above --max-legacy points, as it takes
+minutes on the largest sizes.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy
+import numpy.ma
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ceda_di.metadata.product import BoundsAccumulator, GeoJSONGenerator  # noqa: E402
+
+
+def legacy(item_list):
+    """
+    The previous implementation of GeoJSONGenerator._get_bounds for wrapped
+    coordinates (with more than two values).
+    """
+    items = sorted(numpy.ma.compressed(item_list))
+    first_bound_index = 0
+    second_bound_index = len(items) - 1
+    max_diff = (items[first_bound_index] - items[second_bound_index]) % 360
+    for i in range(1, len(items)):
+        diff = (items[i] - items[i-1]) % 360
+        if diff > max_diff:
+            max_diff = diff
+            first_bound_index = i
+            second_bound_index = i-1
+    return float(items[first_bound_index]), float(items[second_bound_index])
+
+
+def vectorised(lons):
+    return GeoJSONGenerator._get_bounds(lons, wrapped_coords=True)
+
+
+def make_chunked(chunk):
+    def chunked(lons):
+        acc = BoundsAccumulator(wrapped_coords=True)
+        for start in range(0, len(lons), chunk):
+            acc.update(lons[start:start + chunk])
+        return acc.bounds()
+    return chunked
+
+
+def make_longitudes(size, case, seed=0):
+    """
+    Return a masked array of longitudes:
+
+        * "random": scattered over the Pacific, with a gap over the Atlantic
+        * "dateline": a track crossing the dateline, e.g. 170E to 170W
+    """
+    rng = numpy.random.default_rng(seed)
+    if case == "random":
+        lons = rng.uniform(100, 300, size)
+        lons[lons > 180] -= 360
+    else:
+        lons = numpy.linspace(170, 190, size) + rng.normal(0, 0.01, size)
+        lons[lons > 180] -= 360
+    return numpy.ma.masked_array(lons, mask=rng.random(size) < 0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100000,1000000,10000000,100000000")
+    parser.add_argument("--chunk", type=int, default=1000000)
+    parser.add_argument("--max-legacy", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunked = make_chunked(args.chunk)
+    chunked.__name__ = "chunked"
+
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for case in ("random", "dateline"):
+            lons = make_longitudes(size, case)
+            funcs = [vectorised, chunked]
+            assert chunked(lons) == vectorised(lons)
+            if size <= args.max_legacy:
+                funcs.insert(0, legacy)
+                assert legacy(lons) == vectorised(lons)
+
+            print("%d points, %s" % (size, case))
+            for func in funcs:
+                best = min(timeit.repeat(lambda: func(lons), number=1,
+                                         repeat=args.repeat))
+                print("  %-12s %10.1f ms  %r" % (func.__name__, best * 1000,
+                                                 func(lons)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""
+Compare cleaning NetCDF coordinates value by value with the vectorised
+NetCDF_Base.clean_coordinates, on large synthetic coordinate arrays.
+
+    python bench_coordinates.py [--size=<n>] [--repeat=<n>]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy
+import numpy.ma
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ceda_di.filetypes.netcdf import NetCDF_Base  # noqa: E402
+
+
+def make_coordinates(size, seed=0):
+    """
+    Return a masked array of latitudes with some fill values, zeros and
+    NaNs, as found in aircraft data.
+    """
+    rng = numpy.random.default_rng(seed)
+    lats = rng.uniform(-90, 90, size)
+    lats[rng.random(size) < 0.001] = 0.0
+    lats[rng.random(size) < 0.001] = numpy.nan
+    return numpy.ma.masked_array(lats, mask=rng.random(size) < 0.01)
+
+
+def per_value(coords):
+    return list(filter(NetCDF_Base.clean_coordinate, coords.ravel()))
+
+
+def vectorised(coords):
+    return NetCDF_Base.clean_coordinates(coords)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    coords = make_coordinates(args.size)
+    assert numpy.array_equal(numpy.array(per_value(coords)),
+                             vectorised(coords), equal_nan=False)
+
+    print("%d coordinates" % args.size)
+    for func in (per_value, vectorised):
+        best = min(timeit.repeat(lambda: func(coords), number=1,
+                                 repeat=args.repeat))
+        print("%-12s %10.1f ms" % (func.__name__, best * 1000))
+
+
+if __name__ == "__main__":
+    main()
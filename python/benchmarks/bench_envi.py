@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Compare reading the navigation bands of an ENVI BIL file pixel by pixel, as
+envi_io.EnviFile.read did, with the memory-mapped reader. Also compare
+parsing many sibling headers (as from one flight line) with
+envi_io.parse_header and with the per-directory envi_io.parse_header_cached.
+
+    python bench_envi.py [--lines=<n>] [--bands=<n>] [--repeat=<n>]
+                         [--headers=<n>] [--header-bands=<n>]
+"""
+
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import timeit
+
+import numpy
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ceda_di.filetypes.file_io import envi_io  # noqa: E402
+from ceda_di.providers.arsf.envi import BIL  # noqa: E402
+
+
+def write_bil(directory, lines, bands):
+    """
+    Write a navigation BIL file (one sample per line) and return the path of
+    its header.
+    """
+    header = os.path.join(directory, "nav_post_processed.bil.hdr")
+    with open(header, "w") as hdr:
+        hdr.write("ENVI\nsamples = 1\nlines = %d\nbands = %d\n" % (lines, bands))
+    data = numpy.random.default_rng(0).uniform(-90, 90, (lines, bands))
+    data.astype("<f8").tofile(header[:-4])
+    return header
+
+
+def per_pixel(header):
+    """
+    The previous reader: one read() and struct.unpack() per pixel.
+    """
+    b = BIL(header).b
+    bands, lines = int(b.hdr["bands"]), int(b.hdr["lines"])
+    data = [[None] * lines for _ in range(bands)]
+    with open(b.path, "rb") as envi:
+        for y in range(lines):
+            for x in range(bands):
+                data[x][y] = struct.unpack("<d", envi.read(8))[0]
+    return data[1], data[2]
+
+
+def memmap(header):
+    with BIL(header) as envi:
+        spatial = envi.get_geospatial()
+        return spatial["lat"].copy(), spatial["lon"].copy()
+
+
+def sibling_headers(count, bands):
+    """
+    Return the text of "count" headers of a flight line's hyperspectral
+    files, which differ only in "lines".
+    """
+    wavelengths = ", ".join("%.2f" % (400 + 1.5 * i) for i in range(bands))
+    fwhm = ", ".join(["1.90"] * bands)
+    names = ", ".join("band %d" % i for i in range(bands))
+    return [("ENVI\ndescription = {Flight line processed by APL}\n"
+             "samples = 1024\nlines = %d\nbands = %d\nheader offset = 0\n"
+             "file type = ENVI Standard\ndata type = 12\ninterleave = bil\n"
+             "byte order = 0\nwavelength units = nm\nwavelength = {%s}\n"
+             "fwhm = {%s}\nband names = {%s}\n") %
+            (5000 + i, bands, wavelengths, fwhm, names) for i in range(count)]
+
+
+def parse_plain(texts):
+    return [envi_io.parse_header(text) for text in texts]
+
+
+def parse_cached(texts):
+    envi_io._entry_cache.clear()
+    return [envi_io.parse_header_cached(text, "/flight/line") for text in texts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--bands", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--headers", type=int, default=2000)
+    parser.add_argument("--header-bands", type=int, default=252)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        header = write_bil(tmp, args.lines, args.bands)
+        for old, new in zip(per_pixel(header), memmap(header)):
+            assert numpy.array_equal(numpy.array(old), new)
+
+        print("%d lines x %d bands" % (args.lines, args.bands))
+        for func in (per_pixel, memmap):
+            best = min(timeit.repeat(lambda: func(header), number=1,
+                                     repeat=args.repeat))
+            print("%-10s %10.1f ms" % (func.__name__, best * 1000))
+    finally:
+        shutil.rmtree(tmp)
+
+    texts = sibling_headers(args.headers, args.header_bands)
+    assert parse_plain(texts) == parse_cached(texts)
+
+    print("%d headers x %d bands" % (args.headers, args.header_bands))
+    for func in (parse_plain, parse_cached):
+        best = min(timeit.repeat(lambda: func(texts), number=1,
+                                 repeat=args.repeat))
+        print("%-12s %10.1f ms" % (func.__name__, best * 1000))
+
+
+if __name__ == "__main__":
+    main()
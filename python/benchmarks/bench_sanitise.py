@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Compare the runtime and peak memory of GeoJSONGenerator._sanitise_geometry
+with the previous implementation, which built the same masked validity mask
+twice.
+
+    python bench_sanitise.py [--size=<n>] [--repeat=<n>] [--float32]
+
+Peak memory is measured with tracemalloc, which NumPy reports its array
+allocations to.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+import numpy
+import numpy.ma as ma
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ceda_di.metadata.product import GeoJSONGenerator  # noqa: E402
+
+
+def legacy(lons, lats):
+    """
+    The previous implementation (after aligning the arrays).
+    """
+    lons = ma.array(lons)
+    lats = ma.array(lats)
+    lon_mask = ma.getmaskarray(lons)
+    lat_mask = ma.getmaskarray(lats)
+    longitudes = lons[
+        (lons >= -180) & (lons <= 180) & (lats >= -90) & (lats <= 90) &
+        (lon_mask == False) & (lat_mask == False)  # noqa: E712
+    ]
+    latitudes = lats[
+        (lons >= -180) & (lons <= 180) & (lats >= -90) & (lats <= 90) &
+        (lon_mask == False) & (lat_mask == False)  # noqa: E712
+    ]
+    return longitudes, latitudes
+
+
+def fused(lons, lats):
+    gen = GeoJSONGenerator([], [], do_sanitise_geometries=False)
+    gen._sanitise_geometry(lons, lats)
+    return gen.longitudes, gen.latitudes
+
+
+def make_coordinates(size, dtype, seed=0):
+    """
+    Return masked longitude and latitude arrays with some fill values and
+    out of range points.
+    """
+    rng = numpy.random.default_rng(seed)
+    lons = rng.uniform(-190, 190, size).astype(dtype)
+    lats = rng.uniform(-95, 95, size).astype(dtype)
+    return (ma.masked_array(lons, mask=rng.random(size) < 0.01),
+            ma.masked_array(lats, mask=rng.random(size) < 0.01))
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--float32", action="store_true")
+    args = parser.parse_args()
+
+    dtype = numpy.float32 if args.float32 else numpy.float64
+    lons, lats = make_coordinates(args.size, dtype)
+    for old, new in zip(legacy(lons, lats), fused(lons, lats)):
+        assert numpy.array_equal(ma.getdata(old), new)
+
+    print("%d %s coordinates (%.1f MB each)" %
+          (args.size, numpy.dtype(dtype).name, lons.nbytes / 1e6))
+    for func in (legacy, fused):
+        best = min(timeit.repeat(lambda: func(lons, lats), number=1,
+                                 repeat=args.repeat))
+        peak = peak_memory(func, lons, lats)
+        print("%-8s %10.1f ms %10.1f MB peak" %
+              (func.__name__, best * 1000, peak / 1e6))
+
+
+if __name__ == "__main__":
+    main()
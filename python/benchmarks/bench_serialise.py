@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Compare serialising a coordinate-heavy metadata document with
+json.dumps(default=repr), as Properties did, and with
+ceda_di.metadata.serialise (with and without orjson).
+
+    python bench_serialise.py [--points=<n>] [--repeat=<n>]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import timeit
+
+import numpy
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ceda_di.metadata import serialise  # noqa: E402
+
+
+def make_document(points, seed=0):
+    """
+    Return a document like those made for swath or polygon files: many
+    float32 coordinates and some NumPy scalars.
+    """
+    rng = numpy.random.default_rng(seed)
+    lons = rng.uniform(-180, 180, points).astype(numpy.float32)
+    lats = rng.uniform(-90, 90, points).astype(numpy.float32)
+    return {
+        "file": {"path": "/badc/data/file.nc", "size": numpy.int64(12345)},
+        "spatial": {"geometries": {"display": {
+            "type": "LineString",
+            "coordinates": list(zip(lons, lats))}}},
+        "temporal": {"start_time": datetime.datetime(2014, 9, 22, 20, 51, 53)},
+        "misc": {"scale": numpy.float64(0.01), "flag": numpy.bool_(True)},
+    }
+
+
+def legacy(doc):
+    return json.dumps(doc, default=repr)
+
+
+def stdlib(doc):
+    orjson, serialise.orjson = serialise.orjson, None
+    try:
+        return serialise.dumps(doc)
+    finally:
+        serialise.orjson = orjson
+
+
+def fast(doc):
+    return serialise.dumps(doc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    doc = make_document(args.points)
+    funcs = [legacy, stdlib]
+    if serialise.orjson is not None:
+        funcs.append(fast)
+    else:
+        print("orjson is not installed")
+
+    print("%d coordinates" % args.points)
+    for func in funcs:
+        best = min(timeit.repeat(lambda: func(doc), number=1,
+                                 repeat=args.repeat))
+        print("%-8s %10.1f ms %10d bytes" % (func.__name__, best * 1000,
+                                            len(func(doc))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""
+Time the start up of the command line tools.
+
+Each case is run in a fresh interpreter, so the time includes importing
+every module it needs. Run from anywhere:
+
+    python bench_startup.py [--repeat=<n>]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+CONFIG_FILE = os.path.abspath(
+    os.path.join(SRC_DIR, "..", "config", "ceda-di-test.tmpl"))
+
+CASES = [
+    ("interpreter", "pass"),
+    ("di.py --version",
+     "import sys\n"
+     "sys.argv = ['di.py', '--version']\n"
+     "import di\n"
+     "try:\n"
+     "    di.main()\n"
+     "except SystemExit:\n"
+     "    pass\n"),
+    ("HandlerFactory()",
+     "from ceda_di.util.cmd import read_conf\n"
+     "from ceda_di.extract import HandlerFactory\n"
+     "HandlerFactory(read_conf(%r)['handlers'])\n" % CONFIG_FILE),
+    ("Searcher()",
+     "from ceda_di.util.cmd import read_conf\n"
+     "from ceda_di.search import Searcher\n"
+     "Searcher(read_conf(%r))\n" % CONFIG_FILE),
+]
+
+
+def time_case(code, repeat):
+    """
+    Return the best wall clock time of "repeat" fresh interpreters running
+    "code".
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", code], cwd=SRC_DIR,
+                              stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, code in CASES:
+        try:
+            print("%-20s %8.1f ms" % (name, time_case(code, args.repeat) * 1000))
+        except subprocess.CalledProcessError:
+            print("%-20s   failed" % name)
+
+
+if __name__ == "__main__":
+    main()
@@ -52,6 +52,7 @@ setup(
         'xmltodict'
     ],
     extras_require={
+        'fast': ['orjson'],
         'test': ['mock']
     },
     entry_points={
@@ -5,44 +5,333 @@
 import datetime
 import logging
 import logging.config
-import multiprocessing
 import os
+import json
+import queue
+import socket
 import sys
 import re
-import hashlib
+import threading
 
 from elasticsearch.exceptions import TransportError
 
-from ceda_di.search import ElasticsearchClientFactory
+try:
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    try:
+        import sre_constants
+        import sre_parse
+    except ImportError:  # Private modules - see _analyse_pattern
+        sre_constants = sre_parse = None
+
 from ceda_di import index
-from ceda_di.metadata.product import FileFormatError
+from ceda_di import output
+from ceda_di.metadata.product import FileFormatError, GeoJSONGenerator
+from ceda_di.util import discovery
+from ceda_di.util import state
+from ceda_di.util import supervisor
+
+
+class ExtractionError(Exception):
+    """
+    Exception raised by a pool worker when a file cannot be processed.
+    Carries the file's path so the failure can be recorded.
+    """
+    def __init__(self, filename, signature, message):
+        super(ExtractionError, self).__init__(filename, signature, message)
+        self.filename = filename
+        self.signature = signature
+        self.message = message
+
+    def __str__(self):
+        return f"{self.filename}: {self.message}"
+
+
+def _handler_name(handler):
+    """
+    Return the dotted class name of a handler instance.
+    """
+    return f"{type(handler).__module__}.{type(handler).__name__}"
+
+
+def _analyse_pattern(pattern):
+    """
+    Work out what a handler's filename pattern says about the end of a path.
+
+    Returns (tail, min_prefix): "tail" is literal text that any matching path
+    must end with (None if there isn't any). "min_prefix" is set only if the
+    whole pattern is just "tail" anchored at the end, optionally preceded by
+    "." / ".*" / ".+" - i.e. the pattern matches exactly when the path ends
+    with "tail" after at least "min_prefix" other characters.
+
+    The pattern is parsed with the re module's private parser, which can
+    change between Python versions. If it is missing or fails in any way,
+    (None, None) is returned, so the pattern is just matched in full.
+
+    :param str pattern: Regular expression from the "handlers" configuration.
+    :returns: Tuple of (tail or None, min_prefix or None)
+    """
+    try:
+        return _pattern_tail(pattern)
+    except Exception:
+        return None, None
+
+
+def _pattern_tail(pattern):
+    """
+    Parse a pattern for _analyse_pattern (which handles any error).
+    """
+    items = list(sre_parse.parse(pattern))
+    if not items or items[-1] != (sre_constants.AT, sre_constants.AT_END):
+        return None, None
+
+    chars = []
+    i = len(items) - 2
+    while i >= 0 and items[i][0] == sre_constants.LITERAL:
+        chars.append(chr(items[i][1]))
+        i -= 1
+
+    if not chars:
+        return None, None
+    tail = "".join(reversed(chars))
+
+    prefix = items[:i + 1]
+    min_prefix = None
+    if not prefix:
+        min_prefix = 0
+    elif len(prefix) == 1:
+        op, av = prefix[0]
+        if op == sre_constants.ANY:
+            min_prefix = 1
+        elif (op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT) and
+              av[1] == sre_constants.MAXREPEAT and
+              list(av[2]) == [(sre_constants.ANY, None)]):
+            min_prefix = av[0]
+
+    return tail, min_prefix
 
 
 class HandlerFactory(object):
     """
     Factory for file handler classes.
+
+    Handler patterns are compiled and sorted by priority once, when the
+    handler map is loaded. Each pattern is also checked against a literal
+    suffix before its regular expression is run. Where the suffix alone
+    decides every pattern's outcome (e.g. ".nc$"), the candidate handlers are
+    remembered for that file extension.
+
+    Handler classes are only imported the first time a file needs them, so
+    that e.g. a search or a Landsat-only crawl doesn't pay for importing
+    netCDF4, pyhdf, iris and friends.
+
+    If a configuration dictionary is given, each handler class that has a
+    "configure" class method is passed it when the class is first imported.
     """
 
-    def __init__(self, handler_map):
+    def __init__(self, handler_map, config=None):
         self.logger = logging.getLogger(__name__)
+        self.config = config
         self.handlers = {}
 
         for pattern, handler in handler_map.items():
 
             handler_class = handler['class']
             priority = handler['priority']
-            if handler_class != "None":
-                (module, _class) = handler_class.rsplit(".", 1)
+            if handler_class == "None":
+                handler_class = None
+
+            self.handlers[pattern] = {
+                "class": handler_class,  # Dotted path until first use
+                "priority": priority,
+                "timeout": handler.get('timeout')
+                }
+
+        self._compile()
+
+    def _resolve(self, handler):
+        """
+        Return the handler's class, importing it on first use.
+
+        A class that can't be imported raises ImportError - every time it is
+        needed, although the cause is only logged once - so that the files
+        it handles fail rather than being treated as having no handler.
+
+        :param dict handler: Entry from self.handlers.
+        """
+        handler_class = handler['class']
+        if isinstance(handler_class, str):
+            if handler.get('error') is not None:
+                raise ImportError(handler['error'])
 
+            try:
+                (module, _class) = handler_class.rsplit(".", 1)
                 mod = __import__(module, fromlist=[_class])
-                handler = getattr(mod, _class)
+                handler['class'] = getattr(mod, _class)
+            except (ImportError, AttributeError, ValueError) as exc:
+                handler['error'] = "Could not import handler class \"%s\": %s" % (
+                    handler_class, exc)
+                self.logger.exception(handler['error'])
+                raise ImportError(handler['error']) from exc
+
+            handler_class = handler['class']
+            if self.config is not None and hasattr(handler_class, "configure"):
+                handler_class.configure(self.config)
+
+        return handler_class
+
+    def preload(self):
+        """
+        Import every configured handler class now, rather than when the
+        first file needs it. Classes that can't be imported are left to
+        fail the files that need them.
+        """
+        for handler in self.handlers.values():
+            try:
+                self._resolve(handler)
+            except ImportError:
+                pass
+
+    def _compile(self):
+        """
+        Build the dispatch table from self.handlers. Must be called again
+        whenever self.handlers changes.
+        """
+        # Sort by priority to ensure the correct class is returned
+        # when files match multiple signatures (stable, so ties keep
+        # configuration order)
+        entries = sorted(self.handlers.items(), key=lambda h: h[1]['priority'])
+
+        self._dispatch = []
+        for pattern, handler in entries:
+            regex = re.compile(pattern)
+            if regex.flags & re.IGNORECASE:
+                tail, min_prefix = None, None
             else:
-                handler = None
+                tail, min_prefix = _analyse_pattern(pattern)
+            self._dispatch.append((regex, tail, min_prefix, handler))
 
-            self.handlers[pattern] = {
-                "class": handler,
-                "priority": priority
-                }
+        # One expression matching if any of the patterns match
+        try:
+            self._combined = re.compile(
+                "|".join("(?:%s)" % p for p, _ in entries))
+        except re.error:
+            self._combined = None  # e.g. clashing group names
+
+        # Extension => candidate handlers (or None if the extension alone
+        # doesn't decide the outcome)
+        self._by_extension = {}
+
+    def add_handler(self, pattern, handler_class, priority, timeout=None):
+        """
+        Register (or replace) a handler class for a filename pattern.
+
+        :param str pattern: Regular expression matching file paths.
+        :param handler_class: The handler class (or its dotted path), or None
+                              to ignore the files.
+        :param int priority: Lower values are preferred.
+        :param timeout: Time limit in seconds for extracting each file.
+        """
+        self.handlers[pattern] = {
+            "class": handler_class,
+            "priority": priority,
+            "timeout": timeout
+        }
+        self._compile()
+
+    def has_timeouts(self):
+        """
+        Return True if any handler sets a time limit.
+        """
+        return any(h['timeout'] for h in self.handlers.values())
+
+    def _decide_by_extension(self, ext):
+        """
+        Return the candidate handlers for every path ending in "ext", or None
+        if that depends on more of the path than the extension.
+        """
+        if not ext:
+            return None
+
+        handlers = []
+        for _, tail, min_prefix, handler in self._dispatch:
+            if tail is None:
+                return None
+
+            if len(tail) < len(ext):
+                if not ext.endswith(tail):
+                    continue  # Can never match
+                known_prefix = len(ext) - len(tail)
+            elif tail == ext:
+                known_prefix = 0
+            elif tail.endswith(ext):
+                return None  # Depends on the rest of the file name
+            else:
+                continue  # Can never match
+
+            if min_prefix is None or min_prefix > known_prefix:
+                return None  # Depends on the rest of the path
+            handlers.append(handler)
+
+        return handlers
+
+    def _candidates_by_extension(self, filename):
+        """
+        Return the memoised candidate handlers for the file's extension,
+        or None if they have to be worked out from the full path.
+        """
+        base = filename[filename.rfind("/") + 1:]
+        dot = base.rfind(".")
+        ext = base[dot:] if dot > 0 else ""
+
+        try:
+            return self._by_extension[ext]
+        except KeyError:
+            handlers = self._decide_by_extension(ext)
+            self._by_extension[ext] = handlers
+            return handlers
+
+    def _candidates(self, filename):
+        """
+        Return all handlers whose file signatures match, in priority order.
+        """
+        handlers = self._candidates_by_extension(filename)
+        if handlers is not None:
+            return handlers
+
+        if self._combined is not None and not self._combined.search(filename):
+            return []
+
+        return [handler for regex, tail, _, handler in self._dispatch
+                if (tail is None or filename.endswith(tail)) and
+                regex.search(filename)]
+
+    def matches(self, filename):
+        """
+        Return True if any handler's file signature matches the filename.
+        """
+        handlers = self._candidates_by_extension(filename)
+        if handlers is not None:
+            return len(handlers) > 0
+
+        if self._combined is not None:
+            return self._combined.search(filename) is not None
+
+        return len(self._candidates(filename)) > 0
+
+    def timeout_for(self, filename, default=None):
+        """
+        Return the time limit in seconds for extracting a file: that of the
+        first matching handler (by priority) that sets one, or "default".
+
+        Only the file signatures are checked, so no handler is imported.
+        """
+        for handler in self._candidates(filename):
+            if handler['timeout']:
+                return handler['timeout']
+
+        return default
 
     def get_handler(self, filename):
         """
@@ -57,18 +346,8 @@ class HandlerFactory(object):
         """
         Return the class of the correct file handler (un-instantiated).
         """
-        handler_candidates = []  # All handlers whose file signatures match
-
-        for pattern, handler in self.handlers.items():
-            if re.search(pattern, filename):
-                handler_candidates.append(handler)
-
-        # Sort by priority to ensure the correct class is returned
-        # when files match multiple signatures
-        handler_candidates.sort(key=lambda h: h['priority'])
-
-        for handler in handler_candidates:
-            handler_class = handler['class']
+        for handler in self._candidates(filename):
+            handler_class = self._resolve(handler)
             try:
                 handler_class.get_file_format(filename)
                 return handler_class
@@ -81,6 +360,68 @@ class HandlerFactory(object):
         return None
 
 
+# Handler factory owned by a pool worker process (see _init_worker)
+_worker_factory = None
+
+
+def _init_worker(config):
+    """
+    Initialise a pool worker process.
+
+    Builds the worker's own HandlerFactory once, with every handler class
+    imported and configured up front, so that no file pays for the imports
+    of netCDF4, pyhdf, iris etc. Where workers are forked, the modules are
+    already imported in the parent (see Extract.run_parallel), so each new
+    or recycled worker only looks them up.
+
+    :param dict config: Application configuration dictionary.
+    """
+    global _worker_factory
+    _worker_factory = HandlerFactory(config["handlers"], config)
+    _worker_factory.preload()
+    GeoJSONGenerator.configure(config)
+
+
+def extract_document(handler_factory, filename):
+    """
+    Extract metadata from a single file and serialise it.
+
+    The handler's properties are only evaluated once, whichever outputs
+    the document is then sent to.
+
+    :param HandlerFactory handler_factory: Factory to get the file's handler from.
+    :param str filename: Path to the file to process.
+    :returns: Tuple of (handler name or None, JSON document or None)
+    """
+    handler = handler_factory.get_handler(filename)
+    if handler is None:
+        return None, None
+
+    with handler as hand:
+        props = hand.get_properties()
+
+    body = str(props) if props is not None else None
+    return _handler_name(handler), body
+
+
+def _extract_in_worker(filename):
+    """
+    Extract metadata from a single file inside a pool worker.
+
+    :param str filename: Path to the file to process.
+    :returns: Tuple of (filename, file signature, handler name or None,
+              JSON document or None)
+    """
+    signature = None
+    try:
+        signature = state.file_signature(filename)
+        handler_name, body = extract_document(_worker_factory, filename)
+        return filename, signature, handler_name, body
+    except Exception as exc:
+        logging.getLogger(__name__).exception("Failed to extract %s", filename)
+        raise ExtractionError(filename, signature, repr(exc)) from exc
+
+
 class Extract(object):
     """
     File crawler and metadata extractor class.
@@ -90,30 +431,41 @@ class Extract(object):
     def __init__(self, conf, file_list=None):
 
         self.configuration = conf
+        self.state = None  # Opened in run() if "state-db" is configured
+        self.sinks = None  # Opened on first use (see open_sinks)
+        self.results = None  # Queue to the writer thread in pipeline mode
+        self.writer = None
+        self.writer_error = None
+        self.retry = []  # Files that timed out, or crashed their worker
+        self.index_failures = set()
+        self.unflushed = {}  # Files waiting for their documents to be flushed
 
         try:
             self.make_dirs(conf)
             self.logger = self.prepare_logging()
-            self.handler_factory = HandlerFactory(self.conf("handlers"))
+            self.handler_factory = HandlerFactory(self.conf("handlers"), conf)
+            GeoJSONGenerator.configure(conf)
+            self.exclude = discovery.compile_patterns(
+                conf.get("exclude-patterns", discovery.DEFAULT_EXCLUDE_PATTERNS))
 
             if file_list is None:
-                self.file_list = self._build_file_list()
+                self.file_list = self._iter_file_list()
             else:
-                self.file_list = file_list
+                self.file_list = (f for f in file_list
+                                  if self.exclude is None or
+                                  not self.exclude.search(f))
         except KeyError as k:
             sys.stderr.write("Missing configuration option: %s\n\n" % str(k))
 
-    def _build_file_list(self):
+    def _iter_file_list(self):
         """
-        Return file list
-        :return: A list of file paths
+        Lazily walk "input-path", skipping excluded paths and files that no
+        handler would accept.
+        :return: A generator of file paths
         """
-        file_list = []
-        for root, _, files in os.walk(self.conf("input-path"), followlinks=True):
-            for each_file in files:
-                file_list.append(os.path.join(root, each_file))
-
-        return file_list
+        return discovery.walk_files(self.conf("input-path"),
+                                    exclude=self.exclude,
+                                    include=self.handler_factory.matches)
 
     def conf(self, conf_opt):
         """
@@ -166,59 +518,319 @@ class Extract(object):
 
         return log
 
-    def process_file(self, filename):
+    def extract_file(self, filename):
         """
         Instantiate a handler for a file and extract metadata.
+
+        :returns: Tuple of (handler name or None, JSON document or None)
         """
         try:
-            handler = self.handler_factory.get_handler(filename)
-            if handler is not None:
-                with handler as hand:
-                    if self.conf('send-to-index'):
-                        self.index_properties(filename, hand)
-                    if not self.conf('no-create-files'):
-                        self.write_properties(filename, hand)
-        except Exception as exc:
-            print(f"Failure in process_file for {filename}")
+            return extract_document(self.handler_factory, filename)
+        except Exception:
+            self.logger.exception("Failed to extract %s", filename)
             raise
 
-    def index_properties(self, filename, handler):
+    def process_file(self, filename):
         """
-        Index the file in Elasticsearch
+        Extract metadata from a file and send it to the configured outputs.
+
+        :returns: The name of the handler class used, or None.
         """
-        try:
-            props = handler.get_properties()
-        except Exception as e:
-            print(filename)
-            raise e
+        handler_name, body = self.extract_file(filename)
+        self.handle_result(filename, body)
+        return handler_name
 
+    def record_state(self, filename, signature, handler_name, status):
+        """
+        Record the outcome of processing a file in the state database,
+        if one is configured.
+        """
+        if self.state is not None and signature is not None:
+            if filename in self.index_failures:
+                status = state.STATUS_FAILED
+            self.state.record(filename, signature, handler_name, status)
 
-        if props is not None:
-            index = self.conf('es-index')
-            body = str(props)
-            doc_id = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+    def run_serial(self, paths):
+        """
+        Extract metadata from "paths" one at a time in this process.
 
+        :param paths: Iterable of file paths to process.
+        """
+        for path in paths:
+            signature = None
             try:
-                self.es.index(index=index, body=body, id=doc_id)
-            except Exception as err:
-                print(f"FAILED to log: {filename}")
-                print(f"FAILURE ERROR WAS: {str(err)}")
+                if self.state is not None:
+                    signature = state.file_signature(path)
+                handler_name, body = self.extract_file(path)
+            except Exception:
+                self.record_state(path, signature, None, state.STATUS_FAILED)
+                raise
 
+            self.collect_result(path, signature, handler_name, body)
 
-    def write_properties(self, fname, _geospatial_obj):
+    def write_result(self, filename, signature, handler_name, body):
         """
-        Write module properties to an output file.
+        Send an extracted document to the outputs and record that the file
+        was processed - straight away if nothing is written, otherwise once
+        every output has flushed the document (see documents_flushed).
         """
-        # Construct JSON path
-        fname = os.path.basename(fname)
-        json_path = os.path.join(self.conf("output-path"), self.conf("json-path"))
+        if self.sinks is None:
+            self.open_sinks()
 
-        out_fname = f"{json_path}/{os.path.splitext(fname)[0]}.json"
-        props = _geospatial_obj.get_properties()
+        if (body is None or not self.sinks or
+                self.state is None or signature is None):
+            self.handle_result(filename, body)
+            self.record_state(filename, signature, handler_name,
+                              state.STATUS_OK)
+            return
 
-        if props is not None:
-            with open(out_fname, 'w') as j:
-                j.write(str(props))
+        self.unflushed[filename] = [signature, handler_name, len(self.sinks)]
+        self.handle_result(filename, body)
+
+    def documents_flushed(self, filenames):
+        """
+        Record files as processed once every output has flushed their
+        documents, so that an interrupted run never leaves a file marked
+        as done whose document was lost.
+
+        :param filenames: Paths of the files whose documents an output has
+                          flushed.
+        """
+        for filename in filenames:
+            entry = self.unflushed.get(filename)
+            if entry is None:
+                continue
+
+            entry[2] -= 1
+            if entry[2] == 0:
+                del self.unflushed[filename]
+                self.record_state(filename, entry[0], entry[1],
+                                  state.STATUS_OK)
+
+    def collect_result(self, filename, signature, handler_name, body):
+        """
+        Pass an extracted document on to be written - straight away, or via
+        the writer thread's queue in pipeline mode. Blocks while the queue
+        is full.
+        """
+        if self.results is None:
+            self.write_result(filename, signature, handler_name, body)
+            return
+
+        if self.writer_error is not None:
+            raise self.writer_error
+        self.results.put((filename, signature, handler_name, body))
+
+    def start_pipeline(self, size):
+        """
+        Start a thread that writes/indexes documents while extraction
+        carries on, reading from a queue of at most "size" documents.
+        """
+        self.results = queue.Queue(maxsize=size)
+        self.writer_error = None
+        self.writer = threading.Thread(target=self._write_results,
+                                       name="ceda-di-writer", daemon=True)
+        self.writer.start()
+
+    def _write_results(self):
+        """
+        Writer thread: write queued results until the None sentinel arrives.
+        After an error the queue is still drained, so that extraction is
+        never left blocked on a full queue.
+        """
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            if self.writer_error is not None:
+                continue
+
+            try:
+                self.write_result(*item)
+            except Exception as exc:
+                self.logger.exception("Failed to write %s", item[0])
+                self.writer_error = exc
+
+    def finish_pipeline(self, raise_errors=True):
+        """
+        Wait for the writer thread to write everything queued, and re-raise
+        any error it hit.
+
+        :param bool raise_errors: Re-raise the writer thread's error, if any.
+        """
+        if self.results is None:
+            return
+
+        self.results.put(None)
+        self.writer.join()
+        self.results = None
+        self.writer = None
+
+        if raise_errors and self.writer_error is not None:
+            error, self.writer_error = self.writer_error, None
+            raise error
+
+    def open_sinks(self):
+        """
+        Create the outputs that extracted documents are sent to:
+        Elasticsearch if "send-to-index" is set, and JSON files unless
+        "no-create-files" is set. The JSON files are either one per data
+        file, or size-rotated NDJSON files if "output-format" is "ndjson".
+        """
+        self.sinks = []
+
+        # Create index if necessary, and batch documents into bulk requests
+        if self.conf("send-to-index"):
+            indexer = index.BulkIndexer(
+                self.configuration,
+                threshold=self.configuration.get("es-bulk-count", 500),
+                max_bytes=self.configuration.get("es-bulk-bytes",
+                                                 10 * 1024 * 1024),
+                on_error=self.index_failed,
+                on_submit=self.documents_flushed)
+            self.sinks.append(output.IndexSink(indexer))
+
+        if not self.conf("no-create-files"):
+            json_path = os.path.join(self.conf("output-path"),
+                                     self.conf("json-path"))
+            if self.configuration.get("output-format", "json") == "ndjson":
+                self.sinks.append(output.NdjsonSink(
+                    json_path,
+                    max_bytes=self.configuration.get("ndjson-max-bytes",
+                                                     256 * 1024 * 1024),
+                    compress=self.configuration.get("ndjson-compress", False),
+                    on_flush=self.documents_flushed))
+            else:
+                self.sinks.append(output.JsonFileSink(
+                    json_path, on_flush=self.documents_flushed))
+
+    def close_sinks(self):
+        """
+        Flush and close all outputs.
+        """
+        if self.sinks is not None:
+            for sink in self.sinks:
+                sink.close()
+            self.sinks = None
+
+    def index_failed(self, filename, error):
+        """
+        Report a document that Elasticsearch rejected, and make sure the
+        file is retried on the next run.
+
+        :param str filename: Path of the file the document describes.
+        :param error: The error returned by Elasticsearch.
+        """
+        self.logger.error("Failed to index %s: %s", filename, error)
+
+        self.index_failures.add(filename)
+        if self.state is not None:
+            self.state.mark_failed(filename)
+
+    def handle_result(self, filename, body):
+        """
+        Send an extracted document to every configured output.
+
+        :param str filename: Path of the file the document describes.
+        :param str body: JSON document, or None if nothing was extracted.
+        """
+        if body is None:
+            return
+
+        if self.sinks is None:
+            self.open_sinks()
+
+        for sink in self.sinks:
+            sink.write(filename, body)
+
+    def run_parallel(self, paths, num_cores):
+        """
+        Extract metadata from "paths" using a pool of worker processes.
+
+        Results are collected in input order if the "ordered-results"
+        option is set, otherwise in completion order. Workers are replaced
+        after "max-tasks-per-child" files so that memory leaked by the
+        underlying C libraries (pyhdf, netCDF4) cannot grow without limit.
+
+        A worker still extracting a file after its handler's "timeout" (or
+        the "file-timeout" option) is killed and replaced. Such files, and
+        files whose worker crashed, are added to the retry list and the
+        run carries on.
+
+        :param paths: Iterable of file paths to process.
+        :param int num_cores: Number of worker processes.
+        """
+        ordered = self.configuration.get("ordered-results", False)
+        max_tasks = self.configuration.get("max-tasks-per-child", 1000)
+        default_timeout = self.configuration.get("file-timeout")
+
+        # Import the handlers once here, so forked workers start with them
+        self.handler_factory.preload()
+
+        pool = supervisor.SupervisedPool(
+            num_cores, _extract_in_worker,
+            initializer=_init_worker,
+            initargs=(self.configuration,),
+            max_tasks=max_tasks,
+            timeout_for=lambda f: self.handler_factory.timeout_for(
+                f, default_timeout))
+
+        for filename, succeeded, result in pool.imap(paths, ordered=ordered):
+            if succeeded:
+                self.collect_result(*result)
+            elif isinstance(result, ExtractionError):
+                self.record_state(result.filename, result.signature, None,
+                                  state.STATUS_FAILED)
+                raise result
+            else:
+                self.extraction_abandoned(filename, result)
+
+    def extraction_abandoned(self, filename, error):
+        """
+        Record a file whose worker timed out or died, so that it can be
+        retried (e.g. with "di_bq.py process") and the run can carry on.
+
+        :param str filename: Path to the file.
+        :param Exception error: supervisor.TaskTimeout or supervisor.WorkerDied
+        """
+        self.logger.error("Abandoned %s: %s", filename, error)
+        self.retry.append(filename)
+
+        status = state.STATUS_FAILED
+        if isinstance(error, supervisor.TaskTimeout):
+            status = state.STATUS_TIMEOUT
+
+        signature = None
+        if self.state is not None:
+            try:
+                signature = state.file_signature(filename)
+            except OSError:
+                pass
+        self.record_state(filename, signature, None, status)
+
+    def write_retry_list(self):
+        """
+        Write the files to retry as a JSON list, in the same format as the
+        file lists used by "di_bq.py process", to
+        "<output-path>/<retry-path>/<host>-<pid>.json".
+
+        :returns: The path written, or None if there was nothing to retry.
+        """
+        if not self.retry:
+            return None
+
+        retry_dir = os.path.join(self.conf("output-path"),
+                                 self.configuration.get("retry-path", "retry/"))
+        os.makedirs(retry_dir, exist_ok=True)
+
+        retry_file = os.path.join(
+            retry_dir, "%s-%d.json" % (socket.gethostname(), os.getpid()))
+        with open(retry_file, "w") as f:
+            json.dump(self.retry, f)
+
+        self.logger.warning("%d files to retry listed in %s",
+                            len(self.retry), retry_file)
+        return retry_file
 
     def run(self):
         """
@@ -228,40 +840,39 @@ class Extract(object):
         start = datetime.datetime.now()
         self.logger.info(f"Metadata extraction started at: {start.isoformat()}")
 
-        # Create index if necessary
-        if self.conf("send-to-index"):
-            es_factory = ElasticsearchClientFactory()
-            self.es = es_factory.get_client(self.configuration)
-
-            index.create_index(self.configuration, self.es)
-
-        if len(self.file_list) > 0:
-            # Process files
-            #pool = []
-            #
-            #for f in self.file_list:
-            #    # HDF libraries don't seem to like unicode strings,
-            #    # which the filenames will be if the configuration paths
-            #    # loaded from JSON end up in unicode
-            #    path = f
-            #    if "raw" not in path:
-            #        p = multiprocessing.Process(target=self.process_file,
-            #                                    args=(path,))
-            #        pool.append(p)
-            #        p.start()
-            #
-            #    while len(pool) >= self.conf("num-cores"):
-            #        for p in pool:
-            #            if p.exitcode is not None:
-            #                pool.remove(p)
-            #
-            #for p in pool:
-            #    p.join()
-
-            for f in self.file_list:
-                path = f
-                if "raw" not in path:
-                    self.process_file(path)
+        self.open_sinks()
+
+        # Skip files that haven't changed since they were last processed
+        paths = self.file_list
+        if self.configuration.get("state-db"):
+            state_path = os.path.join(self.conf("output-path"),
+                                      self.conf("state-db"))
+            self.state = state.ExtractionState(state_path)
+            paths = self.state.filter_unchanged(paths)
+
+        # Write/index documents in a separate thread, overlapping extraction
+        if self.configuration.get("pipeline", False):
+            self.start_pipeline(self.configuration.get("queue-size", 1000))
+
+        # Process files as they are discovered. Time limits can only be
+        # enforced by running handlers in (supervised) worker processes.
+        try:
+            num_cores = int(self.configuration.get("num-cores", 1))
+            timeouts = (self.configuration.get("file-timeout") or
+                        self.handler_factory.has_timeouts())
+            if num_cores > 1 or timeouts:
+                self.run_parallel(paths, num_cores)
+            else:
+                self.run_serial(paths)
+            self.finish_pipeline()
+        finally:
+            self.finish_pipeline(raise_errors=False)  # After an error
+            try:
+                self.close_sinks()
+                self.write_retry_list()
+            finally:
+                if self.state is not None:
+                    self.state.close()
 
         # Log end of processing
         end = datetime.datetime.now()
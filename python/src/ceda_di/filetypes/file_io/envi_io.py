@@ -8,23 +8,168 @@ Original author: Ben Taylor (benj)
 """
 
 
+import collections
 import logging
 import os
 import stat
 import struct
 
+import numpy as np
+
+# NumPy types of the ENVI header "data type" codes
+DATA_TYPES = {
+    1: np.uint8,
+    2: np.int16,
+    3: np.int32,
+    4: np.float32,
+    5: np.float64,
+    6: np.complex64,
+    9: np.complex128,
+    12: np.uint16,
+    13: np.uint32,
+    14: np.int64,
+    15: np.uint64,
+}
+
+
+# Parsed header entries, by directory (see parse_header_cached)
+_entry_cache = collections.OrderedDict()
+MAX_CACHED_DIRS = 64
+MAX_CACHED_ENTRIES = 1024
+
+
+def _header_entries(text):
+    """
+    Split the text of an ENVI header into its "key = value" entries,
+    joining values in braces that run over several lines.
+    """
+    entry = None
+    for line in text.splitlines():
+        if entry is None:
+            # Ignore comments and the "ENVI" line
+            if line.startswith(";") or "=" not in line:
+                continue
+            entry = line
+        else:
+            entry += "\n" + line
+
+        key, _, value = entry.partition("=")
+        if "{" in value and "}" not in value:
+            continue  # Value continues on the next line
+
+        yield entry
+        entry = None
+
+
+def _parse_header_entry(entry):
+    """
+    Parse one "key = value" entry of an ENVI header.
+
+    :returns: Tuple of (key, value)
+    """
+    key, _, value = entry.partition("=")
+    key = key.strip()
+    value = " ".join(value.split()).strip("{} ")
+
+    if key.lower() == "band names":
+        value = [v.strip() for v in value.split(",")]
+
+    return key, value
+
+
+def parse_header(text):
+    """
+    Parse the text of an ENVI header into key/value pairs (with keys as
+    written, and "band names" as a list).
+
+    :param str text: Text of the header file
+    :returns: Dict of header values
+    """
+    return dict(_parse_header_entry(entry) for entry in _header_entries(text))
+
+
+def _directory_entries(directory):
+    """
+    Return the cache of parsed header entries for a directory.
+    """
+    entries = _entry_cache.pop(directory, None)
+    if entries is None:
+        entries = {}
+        if len(_entry_cache) >= MAX_CACHED_DIRS:
+            _entry_cache.popitem(last=False)
+    _entry_cache[directory] = entries  # Most recently used last
+
+    return entries
+
+
+def parse_header_cached(text, directory):
+    """
+    As parse_header, but entries already parsed for a header in the same
+    directory are looked up rather than parsed again. The headers of files
+    from one flight line differ in little more than "lines", and those of
+    hyperspectral files carry "wavelength" and "fwhm" lists with hundreds of
+    values (see benchmarks/bench_envi.py).
+
+    :param str text: Text of the header file
+    :param str directory: Directory of the header file
+    :returns: Dict of header values
+    """
+    cache = _directory_entries(directory)
+
+    hdr = {}
+    for entry in _header_entries(text):
+        parsed = cache.get(entry)
+        if parsed is None:
+            parsed = _parse_header_entry(entry)
+            if len(cache) < MAX_CACHED_ENTRIES:
+                cache[entry] = parsed
+
+        key, value = parsed
+        hdr[key] = list(value) if isinstance(value, list) else value
+
+    return hdr
+
+
+def select(data, bands=None, lines=None):
+    """
+    Select bands and lines from ENVI data indexed [band][line][sample].
+
+    Integer indexes and slices give views of "data", so on a memory map
+    nothing is read until the values are used. Lists of indexes copy just
+    the selected values.
+
+    :param data: Array indexed [band][line][sample]
+    :param bands: Index, slice or list of indexes of bands (default all)
+    :param lines: Index, slice or list of indexes of lines (default all)
+    :returns: Array indexed [band][line][sample], less any dimension
+              selected with an integer index
+    """
+    if bands is None:
+        bands = slice(None)
+    if lines is None:
+        lines = slice(None)
+
+    if isinstance(bands, (list, tuple, np.ndarray)) and \
+            isinstance(lines, (list, tuple, np.ndarray)):
+        return data[np.ix_(bands, lines)]
+
+    return data[bands, lines]
+
 
 class EnviFile(object):
     """
     Superclass for BilFile and BsqFile.
-    Contains generic read() method that subclasses use to unpack binary data
-    in the correct order.
+    Contains generic read() method that maps the binary data into memory,
+    with the layout given by the subclass's "interleave".
     """
+    interleave = None  # Overridden by child classes
+
     def __init__(self, header_path, path=None, unpack_fmt="<d"):
         """
         :param str header_path: Path to header file.
         :param str path: Path to file. Guessed from header if not provided.
-        :param str unpack_fmt: Format string describing structure of data.
+        :param str unpack_fmt: Format string describing structure of data,
+                               if the header has no "data type".
                                Default: "<d" - little-endian, double precision
         """
         self.logger = logging.getLogger(__name__)
@@ -36,13 +181,33 @@ class EnviFile(object):
             self.path = os.path.splitext(header_path)[0]
 
         self.unpack_fmt = unpack_fmt
+        self.memmap = None
 
         # Try loading the header file
         self.hdr = self.process_hdr()
+        self.keys = {key.lower(): key for key in self.hdr}
+        self.dtype = self.get_dtype()
+
+        interleave = self.header_value("interleave", self.interleave)
+        self.interleave = str(interleave).strip().lower()
+        if self.interleave not in ("bil", "bsq", "bip"):
+            raise ValueError("Unsupported ENVI interleave \"%s\"" % interleave)
 
         # Calculate pixels per line
         if "pixperline" not in self.hdr:
-            self.calc_from_xy()
+            if "samples" in self.keys:
+                self.hdr["pixperline"] = int(self.header_value("samples"))
+            else:
+                self.calc_from_xy()
+
+    def header_value(self, key, default=None):
+        """
+        Return a value from the header, whatever the case of its key.
+
+        :param str key: Lower case key, e.g. "data type"
+        :param default: Value to return if the header has no such key
+        """
+        return self.hdr.get(self.keys.get(key, key), default)
 
     def check_valid_fmt_string(self):
         """
@@ -58,6 +223,27 @@ class EnviFile(object):
 
         return num_bytes
 
+    def get_dtype(self):
+        """
+        Return the type of the binary data: from the header's "data type"
+        and "byte order" if it has them, otherwise from the format string.
+
+        :returns: numpy.dtype
+        """
+        data_type = self.header_value("data type")
+        if data_type is None:
+            self.check_valid_fmt_string()
+            return np.dtype(self.unpack_fmt)
+
+        try:
+            dtype = np.dtype(DATA_TYPES[int(data_type)])
+        except (KeyError, ValueError):
+            raise ValueError("Unsupported ENVI data type \"%s\"" % data_type)
+
+        if str(self.header_value("byte order", "0")).strip() == "1":
+            return dtype.newbyteorder(">")
+        return dtype.newbyteorder("<")
+
     def get_path(self, path, ext):
         """
         Given the path of an ENVI header file, try to guess the path of the
@@ -75,104 +261,107 @@ class EnviFile(object):
 
     def process_hdr(self):
         """
-        Parse the provided header file.
+        Parse the provided header file (see parse_header_cached).
 
         :returns: Header file parsed into key/value pairs
         """
         with open(self.hdr_path, 'r') as fh:
-            lines = fh.readlines()
-
-        hdr = {}
-        for line in lines:
-            # Ignore comments
-            if line.startswith(";"):
-                continue
+            text = fh.read()
 
-            # Load keys into dict
-            split_ln = line.split("=")
-            if len(split_ln) > 1:
-                split_ln = [i.strip(" {}\r\n") for i in split_ln]
-                hdr.update({
-                    split_ln[0]: split_ln[1]
-                })
-
-        if "band names" in hdr:
-            hdr["band names"] = hdr["band names"].split(", ")
-
-        return hdr
+        directory = os.path.dirname(os.path.abspath(self.hdr_path))
+        return parse_header_cached(text, directory)
 
     def calc_from_xy(self):
         """
         Calculate the number of pixels per line based on file size.
         """
-        bands = int(self.hdr["bands"])
-        lines = int(self.hdr["lines"])
+        bands = int(self.header_value("bands"))
+        lines = int(self.header_value("lines"))
+        offset = int(self.header_value("header offset", 0))
 
         filesize = os.stat(self.path)[stat.ST_SIZE]
-        bytesperpix = self.check_valid_fmt_string()
-        pixperline = int((filesize / bands) / lines) / bytesperpix
+        bytesperpix = self.dtype.itemsize
+        pixperline = int(((filesize - offset) / bands) / lines) / bytesperpix
 
         self.hdr["bytesperpix"] = bytesperpix
         self.hdr["filesize"] = filesize
         self.hdr["pixperline"] = pixperline
 
-    def read(self, x_size, y_size, z_size):
+    def open(self):
         """
-        Read an ENVI binary file incrementally, returning arrays containing
-        binary data.
+        Map the binary file into memory (read-only), if not already mapped.
 
-        :param x_size: Number of bands (BIL) || Number of lines (BSQ)
-        :param y_size: Number of lines (BIL) || Number of bands (BSQ)
-        :param z_size: Pixels per line
+        :returns: numpy.memmap with the file's own layout - indexed
+                  [line][band][sample] for BIL, [band][line][sample] for BSQ
+                  and [line][sample][band] for BIP
         """
-        filename = self.path
+        if self.memmap is not None:
+            return self.memmap
 
         try:
             filesize = self.hdr["filesize"]
             bytesperpix = self.hdr["bytesperpix"]
         except KeyError:
             filesize = os.stat(self.path)[stat.ST_SIZE]
-            bytesperpix = self.check_valid_fmt_string()
+            bytesperpix = self.dtype.itemsize
 
         # Check file size matches with size attributes
-        bands = int(self.hdr["bands"])
-        lines = int(self.hdr["lines"])
+        bands = int(self.header_value("bands"))
+        lines = int(self.header_value("lines"))
         pixperline = int(self.hdr["pixperline"])
-        checknum = int((((filesize / bands) /
+        offset = int(self.header_value("header offset", 0))
+        checknum = int(((((filesize - offset) / bands) /
                        lines) / bytesperpix) / pixperline)
         if checknum != 1:
             raise ValueError("File size and supplied attributes do not match")
 
-        with open(filename, 'rb') as envi:
-            # Pre-allocate list
-            data = []
-            for i in range(0, x_size):
-                data.append([])
-                data[i] = [[] for j in range(0, y_size)]
+        if self.interleave == "bil":
+            shape = (lines, bands, pixperline)
+        elif self.interleave == "bip":
+            shape = (lines, pixperline, bands)
+        else:
+            shape = (bands, lines, pixperline)
+
+        self.memmap = np.memmap(self.path, dtype=self.dtype, mode="r",
+                                offset=offset, shape=shape)
+        return self.memmap
+
+    def read(self, bands=None, lines=None):
+        """
+        Return the file's data, or selected bands and lines of it (see
+        select), without reading the rest: pages of the file are only read
+        when the values are used.
 
-            for y in range(0, y_size):
-                for x in range(0, x_size):
-                    for z in range(0, z_size):
-                        # Read one data item (pixel) from the data file.
-                        datum = envi.read(bytesperpix)
+        For BSQ each band is contiguous in the file. For BIL (and BIP) a band
+        is a strided view, taking one value from each line (or sample).
 
-                        # If we get a blank string then we hit EOF unexpectedly
-                        if datum == "":
-                            raise EOFError("Unexpected EOF :(")
+        :param bands: Index, slice or list of indexes of bands (default all)
+        :param lines: Index, slice or list of indexes of lines (default all)
+        :returns: Read-only array indexed [band][line][sample]
+        """
+        data = self.open()
+        if self.interleave == "bil":
+            data = data.transpose(1, 0, 2)
+        elif self.interleave == "bip":
+            data = data.transpose(2, 0, 1)
 
-                        # If everything worked, unpack the binary value
-                        # and store it in the appropriate pixel value
-                        data[x][y] = \
-                            struct.unpack(self.unpack_fmt, datum)[0]
+        return select(data, bands, lines)
 
-        return data
+    def close(self):
+        """
+        Release the memory map. The file is unmapped once no views of it
+        remain.
+        """
+        self.memmap = None
 
 
 class BilFile(EnviFile):
     """
     Child class of EnviFile.
-    Provides correct wrappers of read() methods for reading BIL files in order.
+    Provides the BIL (band interleaved by line) layout for EnviFile.read().
     """
+    interleave = "bil"
+
     def __init__(self, header_path, path=None, unpack_fmt="<d"):
         """
         Call superclass constructor with appropriate parameters.
@@ -187,24 +376,17 @@ class BilFile(EnviFile):
         return self
 
     def __exit__(self, *args):
-        pass
-
-    def read(self):
-        """
-        Read BIL file (reading bytes in correct order)
-
-        :return: A multi-dimensional list containing unpacked BIL data.
-        """
-        return super(BilFile, self).read(int(self.hdr["bands"]),
-                                         int(self.hdr["lines"]),
-                                         int(self.hdr["pixperline"]))
+        self.data = None
+        self.close()
 
 
 class BsqFile(EnviFile):
     """
     Child class of EnviFile.
-    Provides correct wrappers of read() methods for reading BSQ files in order.
+    Provides the BSQ (band sequential) layout for EnviFile.read().
     """
+    interleave = "bsq"
+
     def __init__(self, header_path, path=None, unpack_fmt="<d"):
         """
         Call superclass constructor with appropriate parameters.
@@ -220,14 +402,5 @@ class BsqFile(EnviFile):
         return self
 
     def __exit__(self, *args):
-        pass
-
-    def read(self):
-        """
-        Read BSQ file (reading bytes in correct order)
-
-        :return: A multi-dimensional list containing unpacked BSQ data.
-        """
-        return super(BsqFile, self).read(int(self.hdr["lines"]),
-                                         int(self.hdr["bands"]),
-                                         int(self.hdr["pixperline"]))
+        self.data = None
+        self.close()
@@ -2,16 +2,157 @@
 Metadata adapters for NetCDF files.
 """
 
+import collections
 import logging
 import re
 import os
 
+import numpy
 import numpy.ma
 import netCDF4
 
 from datetime import datetime, timedelta
 from ceda_di._dataset import _geospatial
 from ceda_di.metadata import product
+from ceda_di.metadata.reduction import TrackReducer
+
+
+# Coordinate variables larger than this (in bytes, latitude and longitude
+# together) are read in chunks - see NetCDF_Base.geospatial_chunked
+DEFAULT_MAX_COORDINATE_MEMORY = 512 * 1024 * 1024
+
+
+# Units that identify a variable's role if its standard_name is missing
+ROLE_UNITS = {
+    "latitude": {"degrees_north", "degree_north", "degree_n", "degrees_n"},
+    "longitude": {"degrees_east", "degree_east", "degree_e", "degrees_e"},
+}
+
+# CF "axis" attribute values that identify a variable's role
+ROLE_AXES = {
+    "time": "T",
+}
+
+
+class VariableIndex(object):
+    """
+    Index of a file's variables by standard_name, by coordinate role (from
+    their units or axis) and by name.
+
+    Files from the same product stream share a schema, so indexes are
+    cached by the file's signature - each variable's name with its
+    standard_name, axis and units attributes - and shared, along with the
+    results of their regex lookups, by every file with the same signature.
+    """
+    # Signature => VariableIndex, least recently used first
+    _cache = collections.OrderedDict()
+    cache_size = 128
+
+    def __init__(self, signature):
+        """
+        :param tuple signature: (name, standard_name, axis, units) for each
+                                variable, in file order (see signature)
+        """
+        self.signature = signature
+        self.names = [name for name, _, _, _ in signature]
+        self.by_standard_name = {}
+        self.by_role = {}
+        self.regex_matches = {}
+        self.warned = set()  # Standard names already reported missing
+
+        # The first variable wins, as in a linear search
+        for name, standard_name, axis, units in signature:
+            if isinstance(standard_name, str):
+                self.by_standard_name.setdefault(standard_name.lower(), name)
+
+            role = self._role(axis, units)
+            if role is not None:
+                self.by_role.setdefault(role, name)
+
+    @staticmethod
+    def signature(variables):
+        """
+        Return the signature of a file's variables: (name, standard_name,
+        axis, units) for each, in file order. Only those three attributes
+        are read, and values that aren't strings are given as None.
+
+        :param dict variables: Variable name => variable (e.g. Dataset.variables)
+        """
+        def attribute(var, name):
+            value = getattr(var, name, None)
+            return value if isinstance(value, str) else None
+
+        return tuple((name,
+                      attribute(var, "standard_name"),
+                      attribute(var, "axis"),
+                      attribute(var, "units"))
+                     for name, var in variables.items())
+
+    @staticmethod
+    def _role(axis, units):
+        """
+        Return the coordinate that a variable's units or axis mark it as
+        ("time", "latitude" or "longitude"), or None.
+        """
+        if isinstance(units, str):
+            units = units.strip().lower()
+            for role, role_units in ROLE_UNITS.items():
+                if units in role_units:
+                    return role
+
+        if isinstance(axis, str):
+            axis = axis.strip().upper()
+            for role, role_axis in ROLE_AXES.items():
+                if axis == role_axis:
+                    return role
+
+        return None
+
+    @classmethod
+    def for_dataset(cls, ncdf):
+        """
+        Return the (possibly shared) index of a Dataset's variables.
+
+        :param Dataset ncdf: Reference to an opened netCDF4.Dataset object
+        """
+        signature = cls.signature(ncdf.variables)
+
+        index = cls._cache.get(signature)
+        if index is not None:
+            cls._cache.move_to_end(signature)
+            return index
+
+        index = cls(signature)
+        cls._cache[signature] = index
+        if len(cls._cache) > cls.cache_size:
+            cls._cache.popitem(last=False)
+        return index
+
+    def find_by_standard_name(self, standard_name):
+        """
+        Return the name of the first variable with "standard_name" (case
+        insensitive), or None.
+        """
+        return self.by_standard_name.get(standard_name.lower())
+
+    def find_by_role(self, role):
+        """
+        Return the name of the first variable whose units or axis mark it as
+        the given coordinate ("time", "latitude" or "longitude"), or None.
+        """
+        return self.by_role.get(role)
+
+    def find_by_regex(self, regex):
+        """
+        Return the name of the first variable matching "regex" (case
+        insensitive), or None.
+        """
+        if regex not in self.regex_matches:
+            self.regex_matches[regex] = next(
+                (name for name in self.names
+                 if re.match(regex, name, flags=re.IGNORECASE)), None)
+
+        return self.regex_matches[regex]
 
 
 class NetCDFFactory(object):
@@ -19,25 +160,52 @@ class NetCDFFactory(object):
     Factory for checking, handling and returning an appropriate metadata
     extraction class.
 
+    The file is opened once, here, and the same Dataset is used to detect
+    the convention and for every extraction step. It is closed when the
+    factory is used as a context manager and exits (or by calling close).
+
     :param str fpath: Path to NetCDF file
     """
     def __init__(self, fpath):
         self.fpath = fpath
+        self.ncdf = netCDF4.Dataset(self.fpath)
 
         # Try fetching the 'Convention' global variable from the NetCDF header.
         # Some organisations don't capitalise "Convention" in accordance with
         # the CF/RAF spec, so a regular expression is needed...
         self.convention = None
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            for attr in ncdf.ncattrs():
+        try:
+            for attr in self.ncdf.ncattrs():
                 if re.match(attr, "conventions", flags=re.IGNORECASE):
-                    self.convention = getattr(ncdf, attr)
+                    self.convention = getattr(self.ncdf, attr)
+        except Exception:
+            self.close()
+            raise
+
+    @classmethod
+    def configure(cls, config):
+        """
+        Apply configuration options ("max-coordinate-memory") to all NetCDF
+        handlers.
+
+        :param dict config: Application configuration dictionary.
+        """
+        NetCDF_Base.max_coordinate_memory = config.get(
+            "max-coordinate-memory", DEFAULT_MAX_COORDINATE_MEMORY)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        return None
+        self.close()
+
+    def close(self):
+        """
+        Close the NetCDF file.
+        """
+        if self.ncdf is not None:
+            self.ncdf.close()
+            self.ncdf = None
 
     def get_properties(self):
         """
@@ -47,9 +215,11 @@ class NetCDFFactory(object):
             # Return a placeholder NetCDF handler with no convention
             return NetCDF_Unknown(self.fpath).get_properties()
         elif "CF" in self.convention:
-            return NetCDF_CF(self.fpath, self.convention).get_properties()
+            return NetCDF_CF(self.fpath, self.convention,
+                             self.ncdf).get_properties()
         elif "RAF" in self.convention:
-            return NetCDF_RAF(self.fpath, self.convention).get_properties()
+            return NetCDF_RAF(self.fpath, self.convention,
+                              self.ncdf).get_properties()
         else:
             # Return a placeholder NetCDF handler and log the unknown convention
             return NetCDF_Unknown(self.fpath, self.convention).get_properties()
@@ -61,6 +231,9 @@ class NetCDF_Base(_geospatial):
 
     :param str fpath: Path to NetCDF file
     """
+    # Read coordinates in chunks rather than all at once above this size
+    max_coordinate_memory = DEFAULT_MAX_COORDINATE_MEMORY
+
     @staticmethod
     def params(ncdf):
         """
@@ -90,6 +263,42 @@ class NetCDF_Base(_geospatial):
         except ValueError:
             return False
 
+    @staticmethod
+    def clean_coordinates(coords):
+        """
+        Return the valid values of a coordinate array, flattened.
+
+        The vectorised equivalent of filtering with clean_coordinate: masked
+        values (including "_FillValue"), zeros (misconfigured fill values)
+        and non-finite values are removed in one pass.
+
+        :param coords: Array (or masked array) of coordinate values
+        :returns: 1-D numpy array of valid coordinates
+        """
+        data, valid = NetCDF_Base.valid_coordinates(coords)
+        return data[valid]
+
+    @staticmethod
+    def valid_coordinates(coords):
+        """
+        Flatten a coordinate array and find its valid values (see
+        clean_coordinates).
+
+        :param coords: Array (or masked array) of coordinate values
+        :returns: Tuple of (1-D data array, 1-D boolean array - True if valid)
+        """
+        data = numpy.ma.getdata(coords).ravel()
+        if data.dtype.kind not in "iuf":
+            # Not numbers - nothing usable
+            return data, numpy.zeros(data.shape, dtype=bool)
+
+        valid = ~numpy.ma.getmaskarray(coords).ravel()
+        valid &= data != 0
+        if data.dtype.kind == "f":
+            valid &= numpy.isfinite(data)
+
+        return data, valid
+
     @staticmethod
     def geospatial(ncdf, lat_name, lon_name):
         """
@@ -100,30 +309,129 @@ class NetCDF_Base(_geospatial):
         :param lon_name: Name of parameter containing longitude values
         :returns: Geospatial information as dict.
         """
-
-        # Filter out items that are equal to "masked"
-        lats = list(filter(NetCDF_Base.clean_coordinate,
-                      ncdf.variables[lat_name][:].ravel()))
-        lons = list(filter(NetCDF_Base.clean_coordinate,
-                      ncdf.variables[lon_name][:].ravel()))
+        lat_var = ncdf.variables[lat_name]
+        lon_var = ncdf.variables[lon_name]
+
+        max_memory = NetCDF_Base.max_coordinate_memory
+        if (max_memory and lat_var.shape == lon_var.shape and lat_var.shape and
+                NetCDF_Base._nbytes(lat_var) + NetCDF_Base._nbytes(lon_var) >
+                max_memory):
+            return NetCDF_Base.geospatial_chunked(lat_var, lon_var, max_memory)
+
+        # Filter out masked, zero and non-finite items (kept as arrays)
+        lats = NetCDF_Base.clean_coordinates(lat_var[:])
+        lons = NetCDF_Base.clean_coordinates(lon_var[:])
         return {
             "type": "track",
             "lat": lats,
             "lon": lons
         }
 
+    @staticmethod
+    def _nbytes(var):
+        """Return the size of a variable's data in bytes."""
+        return int(numpy.prod(var.shape)) * numpy.dtype(var.dtype).itemsize
+
+    @staticmethod
+    def _read_rows(var, max_memory):
+        """
+        Return the number of rows (along the first dimension) of "var" to
+        read at a time: a whole number of its on-disk chunks, within
+        "max_memory" bytes.
+        """
+        row_bytes = max(1, NetCDF_Base._nbytes(var) // var.shape[0])
+
+        chunk_rows = 1
+        chunking = var.chunking() if hasattr(var, "chunking") else "contiguous"
+        if chunking != "contiguous" and chunking:
+            chunk_rows = chunking[0]
+
+        # Allow for the copies made while cleaning each chunk
+        rows = max_memory // (row_bytes * 4)
+        return max(chunk_rows, (rows // chunk_rows) * chunk_rows)
+
+    @staticmethod
+    def geospatial_chunked(lat_var, lon_var, max_memory):
+        """
+        Return a dict of lat/lons reduced to a sample of the track (see
+        metadata.reduction.TrackReducer), along with the exact bounds of all
+        the points (see metadata.product.BoundsAccumulator), reading the
+        variables in chunks of at most about "max_memory" bytes.
+
+        Unlike geospatial, a point is only used if both its latitude and
+        longitude are valid and in range.
+
+        :param lat_var: netCDF4.Variable containing latitude values
+        :param lon_var: netCDF4.Variable containing longitude values (same shape)
+        :param int max_memory: Memory ceiling in bytes for the two variables
+        :returns: Geospatial information as dict.
+        """
+        shape = lat_var.shape
+        row_size = int(numpy.prod(shape[1:]))
+        rows = max(NetCDF_Base._read_rows(lat_var, max_memory // 2),
+                   NetCDF_Base._read_rows(lon_var, max_memory // 2))
+
+        reducer = TrackReducer(shape[0] * row_size)
+        lat_bounds = product.BoundsAccumulator()
+        lon_bounds = product.BoundsAccumulator(wrapped_coords=True)
+        for start in range(0, shape[0], rows):
+            stop = min(start + rows, shape[0])
+
+            lats, lat_valid = NetCDF_Base.valid_coordinates(lat_var[start:stop])
+            lons, lon_valid = NetCDF_Base.valid_coordinates(lon_var[start:stop])
+            valid = lat_valid & lon_valid
+            with numpy.errstate(invalid="ignore"):
+                valid &= (numpy.abs(lats) <= 90) & (numpy.abs(lons) <= 180)
+
+            index = numpy.flatnonzero(valid) + start * row_size
+            lats, lons = lats[valid], lons[valid]
+            reducer.update(index, lats, lons)
+            lat_bounds.update(lats)
+            lon_bounds.update(lons)
+
+        lats, lons = reducer.result()
+        return {
+            "type": "track",
+            "lat": lats,
+            "lon": lons,
+            "bounds": {"lat": lat_bounds.bounds(), "lon": lon_bounds.bounds()}
+        }
+
     @staticmethod
     def temporal(ncdf, time_name):
         """
         Extract time values from Dataset using the variable name provided.
 
+        Only the values needed are read. A coordinate variable (one that is
+        its own dimension) should be monotonic under the CF conventions, so
+        its first and last valid values are the start and end - provided a
+        sparse sample of its values agrees. Any other time variable, or one
+        that isn't monotonic after all, is read in full and its minimum and
+        maximum used.
+
         :param Dataset ncdf: Reference to an opened netcdf4.Dataset object
         :param str time_name: Name of the time parameter
         """
         try:
+            var = ncdf.variables[time_name]
+
+            edges = None
+            if tuple(var.dimensions) == (time_name,):
+                edges = NetCDF_Base._monotonic_edges(var)
+
+            if edges is not None:
+                first, last = edges
+            else:
+                values = var[:]
+                data = numpy.ma.getdata(values).ravel()
+                data = data[NetCDF_Base._valid_times(values).ravel()]
+                first, last = (data.min(), data.max()) if data.size else (None, None)
 
-            times = list(netCDF4.num2date(list(ncdf.variables[time_name]),
-                                          ncdf.variables[time_name].units))
+            if first is None:
+                return None
+
+            times = netCDF4.num2date([first, last], var.units,
+                                     getattr(var, "calendar", "standard"))
             return {
                 "start_time": times[0].isoformat(),
                 "end_time": times[-1].isoformat()
@@ -131,6 +439,77 @@ class NetCDF_Base(_geospatial):
         except:
             return None
 
+    @staticmethod
+    def _valid_times(values):
+        """
+        Return a boolean array - True where "values" is neither masked nor
+        (for floating point values) non-finite.
+        """
+        valid = ~numpy.ma.getmaskarray(values)
+        data = numpy.ma.getdata(values)
+        if data.dtype.kind == "f":
+            valid &= numpy.isfinite(data)
+        return valid
+
+    @staticmethod
+    def _monotonic_edges(var, samples=64):
+        """
+        Return the smallest and largest valid values of a 1-D variable from
+        its first and last valid values, if it looks monotonic: the edges
+        and about "samples" evenly spaced values in between are in order.
+
+        :param var: 1-D netCDF4.Variable
+        :param int samples: Number of values to check between the edges
+        :returns: Tuple of (min, max) - (None, None) if there are no valid
+                  values - or None if the values are not monotonic.
+        """
+        first = NetCDF_Base._edge_value(var)
+        if first is None:
+            return None, None
+        last = NetCDF_Base._edge_value(var, from_end=True)
+
+        step = max(1, var.shape[0] // samples)
+        values = var[::step]
+        data = numpy.ma.getdata(values)[NetCDF_Base._valid_times(values)]
+
+        steps = numpy.diff(numpy.concatenate(([first], data, [last])))
+        if not ((steps >= 0).all() or (steps <= 0).all()):
+            return None
+
+        return min(first, last), max(first, last)
+
+    @staticmethod
+    def _edge_value(var, from_end=False):
+        """
+        Return the first (or last) valid value of a 1-D variable.
+
+        Reads a single value, then ever larger blocks further in while the
+        values are all fill values, so usually only one value is read.
+
+        :param var: 1-D netCDF4.Variable
+        :param bool from_end: Search from the end of the variable.
+        :returns: The value, or None if there are no valid values.
+        """
+        length = var.shape[0]
+        done = 0
+        block = 1
+        while done < length:
+            size = min(block, length - done)
+            if from_end:
+                values = var[length - done - size:length - done]
+            else:
+                values = var[done:done + size]
+
+            valid = numpy.flatnonzero(NetCDF_Base._valid_times(values))
+            if valid.size:
+                data = numpy.ma.getdata(values)
+                return data[valid[-1] if from_end else valid[0]]
+
+            done += size
+            block *= 32
+
+        return None
+
     @staticmethod
     def estimate_temporal_from_filename(fpath):
 
@@ -151,40 +530,54 @@ class NetCDF_Base(_geospatial):
         }
 
     @staticmethod
-    def find_var_by_standard_name(ncdf, fpath, standard_name):
+    def find_var_by_standard_name(ncdf, fpath, standard_name, index=None):
         """
-        Find a variable reference searching by CF standard name.
+        Find a variable reference searching by CF standard name, then by
+        name, then by the units or axis that mark the coordinate.
 
         :param Dataset ncdf: Reference to an opened netCDF4.Dataset object
         :param str standard_name: The CF standard name to search for
+        :param VariableIndex index: The file's variable index, if already built
         """
-        for key, value in ncdf.variables.items():
-            try:
-                if value.standard_name.lower() == standard_name.lower():
-                    return key
-            except AttributeError:
-                continue
+        if index is None:
+            index = VariableIndex.for_dataset(ncdf)
+
+        key = index.find_by_standard_name(standard_name)
+        if key:
+            return key
 
+        # Reported once for each file signature, as every file of a product
+        # stream will miss the same standard names
         logger = logging.getLogger(__name__)
-        logger.warning("Could not find standard name variable \"%s\": %s, trying by regex." %
-                     (standard_name, fpath))
+        level = logging.DEBUG if standard_name in index.warned else logging.WARNING
+        index.warned.add(standard_name)
+        logger.log(level, "Could not find standard name variable \"%s\": %s, trying by regex/units." %
+                   (standard_name, fpath))
 
-        key = NetCDF_Base.find_var_by_regex(ncdf, "^%s$" % standard_name)
+        key = (index.find_by_regex("^%s$" % standard_name) or
+               index.find_by_role(standard_name))
         if key:
             return key
 
+        logger.error("Could not find variable by regex or units: \"%s\": %s" %
+                     (standard_name, fpath))
+
 
     @staticmethod
-    def find_var_by_regex(ncdf, regex):
+    def find_var_by_regex(ncdf, regex, index=None):
         """
         Find a variable reference searching by regular expression.
 
         :param Dataset ncdf: Reference to an opened netCDF4.Dataset object
         :param re regex: Regular expression to match with variable name
+        :param VariableIndex index: The file's variable index, if already built
         """
-        for key in ncdf.variables.keys():
-            if re.match(regex, key, flags=re.IGNORECASE):
-                return key
+        if index is None:
+            index = VariableIndex.for_dataset(ncdf)
+
+        key = index.find_by_regex(regex)
+        if key:
+            return key
 
         logger = logging.getLogger(__name__)
         logger.error("Could not find variable by regex: \"%s\": %s" % (regex, ncdf.filepath()))
@@ -226,36 +619,44 @@ class NetCDF_Base(_geospatial):
 class NetCDF_CF(_geospatial):
     """
     Metadata extraction class for CF-compliant NetCDF files.
+
+    :param str fpath: Path to NetCDF file
+    :param str convention: The file's metadata convention
+    :param Dataset ncdf: The file, opened by the caller
     """
-    def __init__(self, fpath, convention):
+    def __init__(self, fpath, convention, ncdf):
         self.fpath = fpath
         self.logger = logging.getLogger(__name__)
         self.convention = convention
+        self.ncdf = ncdf
+        self.index = VariableIndex.for_dataset(ncdf)
 
     def get_temporal(self):
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            time_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "time")
-            temporal = NetCDF_Base.temporal(ncdf, time_name)
-            if temporal:
-                return temporal
-            else:
-                # Can't read time data, approximate time from filename
-                return NetCDF_Base.estimate_temporal_from_filename(self.fpath)
+        ncdf = self.ncdf
+        time_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "time",
+                                                          self.index)
+        temporal = NetCDF_Base.temporal(ncdf, time_name)
+        if temporal:
+            return temporal
+        else:
+            # Can't read time data, approximate time from filename
+            return NetCDF_Base.estimate_temporal_from_filename(self.fpath)
 
     def get_parameters(self):
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            return NetCDF_Base.params(ncdf)
+        return NetCDF_Base.params(self.ncdf)
 
     def get_geospatial(self):
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            lat_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "latitude")
-            lon_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "longitude")
-
-            if lat_name and lon_name:
-                return NetCDF_Base.geospatial(ncdf, lat_name, lon_name)
-            else:
-                self.logger.error("Could not find lat/lon variables: %s" %
-                                  self.fpath)
+        ncdf = self.ncdf
+        lat_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "latitude",
+                                                         self.index)
+        lon_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "longitude",
+                                                         self.index)
+
+        if lat_name and lon_name:
+            return NetCDF_Base.geospatial(ncdf, lat_name, lon_name)
+        else:
+            self.logger.error("Could not find lat/lon variables: %s" %
+                              self.fpath)
 
     def get_properties(self):
         """
@@ -277,29 +678,37 @@ class NetCDF_CF(_geospatial):
 class NetCDF_RAF(_geospatial):
     """
     Metadata extraction class for NCAR-RAF-compliant NetCDF.
+
+    :param str fpath: Path to NetCDF file
+    :param str convention: The file's metadata convention
+    :param Dataset ncdf: The file, opened by the caller
     """
-    def __init__(self, fpath, convention):
+    def __init__(self, fpath, convention, ncdf):
         self.fpath = fpath
         self.logger = logging.getLogger(__name__)
         self.convention = convention
+        self.ncdf = ncdf
+        self.index = VariableIndex.for_dataset(ncdf)
 
     def get_temporal(self):
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            time_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "time")
-            return NetCDF_Base.temporal(ncdf, time_name)
+        ncdf = self.ncdf
+        time_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "time",
+                                                          self.index)
+        return NetCDF_Base.temporal(ncdf, time_name)
 
     def get_parameters(self):
-        with netCDF4.Dataset(self.fpath) as ncdf:
-            return NetCDF_Base.params(ncdf)
+        return NetCDF_Base.params(self.ncdf)
 
     def get_geospatial(self):
+        ncdf = self.ncdf
         try:
             # Try finding corrected latitude and longitude
-            with netCDF4.Dataset(self.fpath) as ncdf:
-                return NetCDF_Base.geospatial(ncdf, "LATC", "LONC")
-        except AttributeError:
-            lat_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "latitude")
-            lon_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "longitude")
+            return NetCDF_Base.geospatial(ncdf, "LATC", "LONC")
+        except (KeyError, AttributeError):
+            lat_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "latitude",
+                                                             self.index)
+            lon_name = NetCDF_Base.find_var_by_standard_name(ncdf, self.fpath, "longitude",
+                                                             self.index)
 
             if lat_name and lon_name:
                 return NetCDF_Base.geospatial(ncdf, lat_name, lon_name)
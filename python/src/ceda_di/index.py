@@ -29,23 +29,33 @@ class BulkIndexer(object):
     by pooling documents and submitting in large bulk requests when
     the document count reaches a certain threshold.
     """
-    def __init__(self, config, threshold=1000):
+    def __init__(self, config, threshold=1000, max_bytes=10 * 1024 * 1024,
+                 on_error=None, on_submit=None):
         """
         :param dict config: Application configuration dictionary, including ES config.
         :param int threshold: The number of documents to hold in the buffer before indexing.
+        :param int max_bytes: The size of serialised documents to hold in the buffer before indexing.
+        :param on_error: Optional callable taking (source, error) for each document
+                         Elasticsearch rejects. If not given, an exception is raised instead.
+        :param on_submit: Optional callable taking the list of sources in each pool once it has
+                          been submitted (after on_error is called for any rejected documents).
         """
         self.index = config["es-index"]
         self.default_mapping = config["es-mapping"]
         self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.on_error = on_error
+        self.on_submit = on_submit
         self.es = ElasticsearchClientFactory.get_client(config)
 
         # If the index doesn't exist, create it
         # This will throw an error if the index already exists this is *fine*
         create_index(config, self.es)
 
-        # Dict containing key:value pairs of mapping:[list of documents]
+        # Dict containing key:value pairs of mapping:[list of (action, document, source)]
         # That way, this class can handle indexing multiple types of documents
         self.doc_pool = {}
+        self.pool_bytes = {}
 
     def __enter__(self):
         return self
@@ -53,29 +63,60 @@ class BulkIndexer(object):
     def __exit__(self, exc_type, value, traceback):
         self.submit_pools()
 
-    def add_to_index_pool(self, document, mapping=None):
+    def add_to_index_pool(self, document, mapping=None, doc_id=None, source=None):
         """
         Add document to the correct pool, dependent on mapping type.
+        :param object document: The JSON-serialisable object (or JSON string) to index.
         :param str mapping: The mapping to index the document into.
-        :param object document: The JSON-serialisable object to index.
+        :param str doc_id: Optional document ID.
+        :param source: Identifies the document (e.g. the data file path) if it is rejected.
         """
         # Set default mapping
         if not mapping:
             mapping = self.default_mapping
 
+        # Serialise once here, so the pool size is known and the
+        # Elasticsearch client passes the string straight through
+        if not isinstance(document, str):
+            document = json.dumps(document)
+
+        if doc_id is not None:
+            action = {"index": {"_id": doc_id}}
+        else:
+            action = {"index": True}
+
+        self._add_action(mapping, action, document, source)
+
+    def _add_action(self, mapping, action, document, source):
+        """
+        Add an (action, document) pair to a pool, submitting the pool if it
+        is full.
+        :param str mapping: The mapping to index the document into.
+        :param action: The bulk action, as a dict or a JSON string.
+        :param str document: The serialised document.
+        :param source: Identifies the document if it is rejected.
+        """
         # Create the pool if it doesn't exist
         if mapping not in self.doc_pool:
             self.doc_pool[mapping] = []
+            self.pool_bytes[mapping] = 0
 
-        self.doc_pool[mapping].append(document)
+        self.doc_pool[mapping].append((action, document, source))
+        self.pool_bytes[mapping] += len(document)
 
-        # If we've met the threshold, then submit all of the documents
-        if len(self.doc_pool[mapping]) >= self.threshold:
+        # If we've met either threshold, then submit all of the documents
+        if (len(self.doc_pool[mapping]) >= self.threshold or
+                self.pool_bytes[mapping] >= self.max_bytes):
             self.submit_pool(mapping)
 
     def index_directory(self, path, mapping=None):
         """
         Indexes all files in a given directory.
+
+        Files ending ".ndjson" or ".ndjson.gz" (see ceda_di.output.NdjsonSink)
+        are streamed line by line and their action/document pairs sent as
+        they are, so memory use doesn't depend on the file size. Any other
+        file is loaded as a single JSON document.
         :param str path: The path to the directory containing the data files.
         :param str mapping: The mapping type (doc type) for the document to be indexed as.
         """
@@ -85,14 +126,51 @@ class BulkIndexer(object):
 
         import os  # Only import in this method - it's not needed anywhere else
         for root, _, files in os.walk(path):
-            for file_name in files:
+            for file_name in sorted(files):
                 path = os.path.join(root, file_name)
-                with open(path, 'r') as file_handle:
-                    self.add_to_index_pool(json.load(file_handle), mapping)
+                if file_name.endswith((".ndjson", ".ndjson.gz")):
+                    self.index_ndjson(path, mapping)
+                else:
+                    with open(path, 'r') as file_handle:
+                        self.add_to_index_pool(json.load(file_handle), mapping)
 
         # Make sure all documents are submitted to the index
         self.submit_pool(mapping)
 
+    def index_ndjson(self, path, mapping=None):
+        """
+        Stream the action/document line pairs of a bulk format NDJSON file
+        (optionally gzip compressed) into the index pool.
+        :param str path: The path to the NDJSON file.
+        :param str mapping: The mapping type (doc type) for the document to be indexed as.
+        """
+        # Set default mapping
+        if not mapping:
+            mapping = self.default_mapping
+
+        if path.endswith(".gz"):
+            import gzip
+            file_handle = gzip.open(path, 'rt', encoding='utf-8')
+        else:
+            file_handle = open(path, 'r', encoding='utf-8')
+
+        with file_handle:
+            action = None
+            for line_number, line in enumerate(file_handle, 1):
+                line = line.rstrip("\n")
+                if not line:
+                    continue
+
+                if action is None:
+                    action = line
+                else:
+                    self._add_action(mapping, action, line,
+                                     "%s:%d" % (path, line_number))
+                    action = None
+
+        # An action without a document (e.g. the end of a file from a
+        # killed run) is ignored
+
     def submit_pool(self, mapping=None):
         """
         Submit current document grouping (grouped by mapping) to the
@@ -103,21 +181,51 @@ class BulkIndexer(object):
         if not mapping:
             mapping = self.default_mapping
 
+        pool = self.doc_pool.get(mapping, [])
+        if not pool:
+            return
+
         # Elasticsearch's Bulk API expects data in a strange format (see link)
         # http://www.elasticsearch.org/guide/en/elasticsearch/reference/current/docs-bulk.html
         docs = []
-        for doc in self.doc_pool[mapping]:
-            docs.append({"index": True})
+        for action, doc, _ in pool:
+            docs.append(action)
             docs.append(doc)
 
+        # Empty the pool before submitting, so a failed request isn't resent
+        self.doc_pool[mapping] = []
+        self.pool_bytes[mapping] = 0
+
+        try:
+            response = self.es.bulk(docs, index=self.index, timeout=75)
+        except (ElasticsearchException, TransportError) as err:
+            if self.on_error is None:
+                raise
+            for _, _, source in pool:
+                self.on_error(source, str(err))
+            self._submitted(pool)
+            return
+
         # We want to see any errors that are thrown up by Elasticsearch
-        response = self.es.bulk(docs, index=self.index, timeout=75)
         if response["errors"] is True:
-            raise ElasticsearchException(
-                "Error response from Elasticsearch server: %s" % response)
+            if self.on_error is None:
+                raise ElasticsearchException(
+                    "Error response from Elasticsearch server: %s" % response)
 
-        # Empty the list now that we've indexed all the docs from it
-        self.doc_pool[mapping] = []
+            # Items come back in the order they were sent
+            for (_, _, source), item in zip(pool, response["items"]):
+                result = next(iter(item.values()))
+                if "error" in result:
+                    self.on_error(source, result["error"])
+
+        self._submitted(pool)
+
+    def _submitted(self, pool):
+        """
+        Report the sources of a submitted pool to on_submit.
+        """
+        if self.on_submit is not None:
+            self.on_submit([source for _, _, source in pool])
 
     def submit_pools(self):
         """
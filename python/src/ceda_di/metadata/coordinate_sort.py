@@ -1,100 +1,167 @@
 #!/bin/python
 
-'''                         
+'''
     Sort coordinates to counterclockwise order, and make sure the polygon is closed
-    
+
     Assumptions:
      - Coordinates are supplied as a list of  lat, lon (y,x) pairs.
      - There is not a large polygon which spreads west -> east -175 lon -> 175 lon. All polygons are localised.
 
+    The work is done with NumPy on batches of polygons with the same number of
+    points (see condition_polygons), so that many footprints can be
+    conditioned at once.
+
 '''
 
-from math import pi, atan2, sqrt
+import numpy as np
 
 
-def find_midpoint(coordinates):
-    '''Remove duplicates and calculate average lon,lat'''
+def _midpoints(xy):
+    '''
+    Average lon and lat of each polygon, ignoring duplicate values.
+
+    :param xy: array of shape (polygons, points, 2)
+    :return: array of shape (polygons, 2)
+    '''
+    values = np.sort(xy, axis=1)
+    first = np.ones(values.shape, dtype=bool)
+    first[:, 1:] = values[:, 1:] != values[:, :-1]
 
-    x = set([float(x[0]) for x in coordinates])  # lon
-    y = set([float(y[1]) for y in coordinates])  # lat
+    return (values * first).sum(axis=1) / first.sum(axis=1)
 
-    midx = sum(x) / len(x)
-    midy = sum(y) / len(y)
 
-    return [midx, midy]
+def _sorting_indices(xy):
+    '''
+    Counter-clockwise sorting index of each polygon (see calculate_sorting_index).
 
+    :param xy: array of shape (polygons, points, 2)
+    :return: list of 1-D index arrays
+    '''
+    midpoints = _midpoints(xy)
+    u = xy[..., 0] - midpoints[:, 0:1]  # lon
+    v = xy[..., 1] - midpoints[:, 1:2]  # lat
 
-def reference_vectors(coordinates, midpoint):
-    '''Get the atan2 result for the reference vector. This is the first point from the coordinate list'''
+    # Winding angle from the first point, constrained to be counter-clockwise
+    theta = np.arctan2(v, u)
+    angle = theta[:, 0:1] - theta
+    angle[angle > 0] -= 2 * np.pi
 
-    first_point = coordinates[0]
-    u = first_point[0] - midpoint[0]  # lon
-    v = first_point[1] - midpoint[1]  # lat
+    distance = np.sqrt(u ** 2 + v ** 2)
 
-    reference = atan2(v, u)  # lat, lon
-    return reference
+    # Sort on ascending angle and decending distance
+    order = np.lexsort((-distance, -angle), axis=-1)
+    if xy.shape[1] < 2:
+        return [np.append(row, row[0]) for row in order]
 
+    # Check to see if the polygon coords close and order appropriately.
+    angle = np.take_along_axis(angle, order, axis=-1)
+    distance = np.take_along_axis(distance, order, axis=-1)
+    closed = (angle[:, 1] == 0) & (distance[:, 1] == distance[:, 0])
+
+    indices = []
+    for row, is_closed in zip(order, closed):
+        if is_closed:
+            indices.append(np.concatenate((row[0:1], row[2:], row[1:2])))
+        else:
+            indices.append(np.append(row, row[0]))
 
-def magnitude(u, v):
-    '''Returns the vector magnitude'''
-    return sqrt(u ** 2 + v ** 2)
+    return indices
 
 
-def winding_angle(reference_vector, lon, lat):
+def _ccw(xy):
     '''
-    Calculates the winding angle from the coordinates
-    :param reference_vector: the atan2 result calculated using the first point
-    :param lon: lon coordinate
-    :param lat: lat coodinate
-    :return: winding angle
+    Whether each polygon is defined counter-clockwise (positive signed area).
+
+    :param xy: array of shape (polygons, points, 2)
+    :return: 1-D boolean array
     '''
+    x = xy[..., 0]
+    y = xy[..., 1]
+    signed_area = (x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y).sum(axis=-1)
 
-    u = lon
-    v = lat
-    angle = reference_vector - atan2(v, u)  # lat, lon
+    return signed_area > 0
 
-    return angle
 
+def _on_dateline(lons):
+    '''
+    Whether each polygon has points within 5 degrees either side of the date line.
 
-def calculate_sorting_index(coordinates):
+    :param lons: array of shape (polygons, points)
+    :return: 1-D boolean array
     '''
-    :param coordinates: list of [Lon, lat] coordinate pairs
-    :return: Sorting index to be applied to ensure that the list is a closed loop of counter-clockwise definition.
+    near = (lons >= 175) | (lons <= -175)
+    east = (near & (lons > 0)).any(axis=-1)
+    west = (near & (lons < 0)).any(axis=-1)
+
+    return east & west
+
+
+def _translate(lons):
     '''
-    midpoint = find_midpoint(coordinates)
-    reference = reference_vectors(coordinates, midpoint)
+    Shift longitudes by 180 degrees, to or from the meridian.
+    '''
+    return np.where(lons < 0, lons + 180, lons - 180)
 
-    index = []
-    for i, point in enumerate(coordinates):
 
-        u = point[0] - midpoint[0]  # lon
-        v = point[1] - midpoint[1]  # lat
+def _filter_dupes(xy):
+    '''
+    Remove consecutive duplicate points from an array of shape (points, 2).
+    '''
+    keep = np.ones(len(xy), dtype=bool)
+    keep[1:] = (xy[1:] != xy[:-1]).any(axis=1)
 
-        angle = winding_angle(reference, u, v)
+    return xy[keep]
 
-        # constrain to be counter-clockwise
-        if angle > 0:
-            angle -= 2 * pi
 
-        distance = magnitude(u, v)
+def _condition_batch(xy):
+    '''
+    Condition polygons with the same number of points (see conditionPolygon).
 
-        index.append({'angle': angle, 'distance': distance, 'coordindex': i})
+    :param xy: array of shape (polygons, points, 2)
+    :return: list of arrays of shape (points, 2)
+    '''
+    xy = np.array(xy, dtype=np.float64)
 
-    # Sort on ascending angle and decending distance
-    index = sorted(index, key=lambda x: (-x['angle'], -x['distance']))
+    # If polygon crosses the dateline, translate the polygon to the meridian for processing.
+    dateline = _on_dateline(xy[..., 0])
+    xy[dateline, :, 0] = _translate(xy[dateline, :, 0])
+
+    # Define counter-clockwise
+    polygons = list(xy)
+    clockwise = np.flatnonzero(~_ccw(xy))
+    if len(clockwise):
+        for i, index in zip(clockwise, _sorting_indices(xy[clockwise])):
+            polygons[i] = xy[i][index]
+
+    for i, coords in enumerate(polygons):
+        # Remove duplicate values
+        coords = _filter_dupes(coords)
+
+        # Close polygon
+        if not np.array_equal(coords[0], coords[-1]):
+            coords = np.concatenate((coords, coords[0:1]))
+
+        # If polygon crosses the dateline, translate the polygon back to the date line.
+        if dateline[i]:
+            coords[:, 0] = _translate(coords[:, 0])
+
+        polygons[i] = coords
+
+    return polygons
 
-    # Check to see if the polygon coords close and order appropriately.
-    closed = False
-    start = index[0]
-    if index[1]['angle'] == 0:
-        if index[1]['distance'] == start['distance']:
-            closed = True
-            index.append(index.pop(1))
 
-    if not closed:
-        index.append(index[0])
+def find_midpoint(coordinates):
+    '''Remove duplicates and calculate average lon,lat'''
+
+    return _midpoints(np.array([coordinates], dtype=np.float64))[0].tolist()
 
-    return [d['coordindex'] for d in index]
+
+def calculate_sorting_index(coordinates):
+    '''
+    :param coordinates: list of [Lon, lat] coordinate pairs
+    :return: Sorting index to be applied to ensure that the list is a closed loop of counter-clockwise definition.
+    '''
+    return _sorting_indices(np.array([coordinates], dtype=np.float64))[0].tolist()
 
 
 def sort_coords(coordinates):
@@ -104,14 +171,7 @@ def sort_coords(coordinates):
     :param coordinates: list of [lon, lat] coordinate pairs.
     :return: a sorted list of [lon, lat] coordinate pairs
     '''
-
-    sorting_index = calculate_sorting_index(coordinates)
-
-    sorted_coordinates = []
-    for i in sorting_index:
-        sorted_coordinates.append(coordinates[i])
-
-    return sorted_coordinates
+    return [coordinates[i] for i in calculate_sorting_index(coordinates)]
 
 
 def ccw(coordinates):
@@ -119,33 +179,15 @@ def ccw(coordinates):
     Accepts a [lon, lat] list and determines the orientation of the coordinates.
     Returns true if the shape is counter-clockwise and false if the polygon is defined clockwise.
     '''
-
-    signedArea = 0
-    end = len(coordinates)
-    for i, point in enumerate(coordinates):
-        x1 = point[0]
-        y1 = point[1]
-        if i == end - 1:
-            x2 = coordinates[0][0]
-            y2 = coordinates[0][1]
-        else:
-            x2 = coordinates[i + 1][0]
-            y2 = coordinates[i + 1][1]
-
-        signedArea += (x1 * y2 - x2 * y1)
-
-    if signedArea > 0:
-        return True  # counter-clockwise
-    else:
-        return False  # clockwise
+    return bool(_ccw(np.array([coordinates], dtype=np.float64))[0])
 
 
 def close_polygon(coordinates):
     '''
     Closes the polygon by duplicating the first coordinate pair and adding to the end.
 
-    :param coordinates: 
-    :return: A closed polygon 
+    :param coordinates:
+    :return: A closed polygon
     '''
     first = coordinates[0]
 
@@ -159,13 +201,8 @@ def filterDupes(coordinates):
     :param coordinates:  A list of [lon, lat] coordinate pairs.
     :return: same list with consecutive duplicates removed.
     '''
-
-    for i, pair in enumerate(coordinates):
-        if i > 0:
-            if pair == coordinates[i - 1]:
-                coordinates.pop(i)
-
-    return coordinates
+    return [pair for i, pair in enumerate(coordinates)
+            if i == 0 or list(pair) != list(coordinates[i - 1])]
 
 
 def onDateLine(coordinates):
@@ -175,23 +212,9 @@ def onDateLine(coordinates):
     :return: True  - The polygon crosses the date line
              False - The polygon does not cross the dateline
     '''
-    lon_filter = [pair[0] for pair in coordinates if pair[0] >= 175 or pair[0] <= -175]
+    lons = np.array([coordinates], dtype=np.float64)[..., 0]
 
-    # lon_filter returns empty list if the polygon is no where near the date line.
-    if not lon_filter:
-        return False
-
-    # lon_filter identified that the polygon is close to the date line.
-    # If there are positive and negative longitude values, the polygon crosses the dateline, else false.
-    east = 0
-    west = 0
-    for lon in lon_filter:
-        if lon > 0: east += 1
-        if lon < 0: west += 1
-        if east > 0 and west > 0:
-            return True
-
-    return False
+    return bool(_on_dateline(lons)[0])
 
 
 def translateCoordinates(coordinates):
@@ -200,18 +223,34 @@ def translateCoordinates(coordinates):
     :param coordinates: list of [lon, lat] coordinate pairs
     :return: coordinates list shifted to dateline or meridian.
     '''
-    translated_coordinates = []
+    xy = np.array(coordinates, dtype=np.float64)
+    xy[:, 0] = _translate(xy[:, 0])
 
-    for pair in coordinates:
-        if pair[0] < 0:
-            pair[0] += 180
+    return xy.tolist()
 
-        else:
-            pair[0] -= 180
 
-        translated_coordinates.append(pair)
+def condition_polygons(polygons):
+    '''
+    Condition a batch of polygons at once (see conditionPolygon). Polygons
+    with the same number of points are processed together.
 
-    return translated_coordinates
+    :param polygons: list of lists of [lon, lat] coordinate pairs (or an
+                     array of shape (polygons, points, 2))
+    :return: list of sanitised polygons, as lists of [lon, lat] pairs
+    '''
+    results = [[] for _ in range(len(polygons))]
+
+    groups = {}
+    for i, coordinates in enumerate(polygons):
+        if len(coordinates):
+            groups.setdefault(len(coordinates), []).append(i)
+
+    for size, members in groups.items():
+        xy = np.array([polygons[i] for i in members], dtype=np.float64)
+        for i, coords in zip(members, _condition_batch(xy.reshape(len(members), size, 2))):
+            results[i] = coords.tolist()
+
+    return results
 
 
 def conditionPolygon(coordinates):
@@ -222,30 +261,9 @@ def conditionPolygon(coordinates):
      2. Removes and duplicate coordinates that are not starting or closing the polygon.
      3. Checks if polygon is closed, if not closes it.
 
+    Polygons that cross the dateline are translated to the meridian for processing.
+
     :param coordinates: list of [lon, lat] coordinate pairs
     :return: sanitised coordinates, making sure it is a closed polygon and defined counter-clockwise
     '''
-
-    # check to see whether the polygon crosses the dateline
-    traverse_dateline = onDateLine(coordinates)
-
-    # If polygon crosses the dateline, translate the polygon to the meridian for processing.
-    if traverse_dateline:
-        coordinates = translateCoordinates(coordinates)
-
-    # Define counter-clockwise
-    if not ccw(coordinates):
-        coordinates = sort_coords(coordinates)
-
-    # Remove duplicate values
-    coordinates = filterDupes(coordinates)
-
-    # Close polygon
-    if not coordinates[0] == coordinates[-1]:
-        coordinates = close_polygon(coordinates)
-
-    # If polygon crosses the dateline, translate the polygon back to the date line.
-    if traverse_dateline:
-        coordinates = translateCoordinates(coordinates)
-
-    return coordinates
+    return condition_polygons([coordinates])[0]
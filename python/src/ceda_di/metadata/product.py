@@ -4,10 +4,10 @@ Module for holding and exporting file metadata as JSON documents.
 
 
 from .coordinate_sort import conditionPolygon
+from .serialise import dumps
+from .simplify import simplify_track
 import hashlib
-import json
 import logging
-import math
 import numpy.ma as ma
 import numpy as np
 
@@ -27,15 +27,44 @@ class GeoJSONGenerator(object):
         * Polygon => GeoJSON "Polygon" - i.e. anything that is a bounding polygon.
         * Photography / stationary observation points => GeoJSON "Point"
         * Satellite swaths => GeoJSON "MultiPolygon"
+
+    Tracks are simplified to at most "track_points" vertices (see
+    ceda_di.metadata.simplify). If "search_track_points" is set, a track's
+    search geometry is also a simplified LineString, with that many
+    vertices, rather than its envelope.
     """
-    def __init__(self, latitudes, longitudes, shape_type=None, do_sanitise_geometries=True):
+    track_points = 30
+    track_tolerance = 0.0
+    search_track_points = None
+
+    def __init__(self, latitudes, longitudes, shape_type=None, do_sanitise_geometries=True,
+                 dtype=None, bounds=None):
+        """
+        :param bounds: Optional dict of the "lat" and "lon" bounds of all the
+                       coordinates, as returned by _get_bounds, for when the
+                       coordinates given are only a reduced set of them (see
+                       BoundsAccumulator)
+        """
         if do_sanitise_geometries:
-            self._sanitise_geometry(ma.array(longitudes), ma.array(latitudes))
+            self._sanitise_geometry(longitudes, latitudes, dtype)
         else:
             self.latitudes = latitudes
             self.longitudes = longitudes
             
         self.shape_type = shape_type
+        self.bounds = bounds
+
+    @classmethod
+    def configure(cls, config):
+        """
+        Apply configuration options ("track-points", "track-tolerance" and
+        "search-track-points") to all generators.
+
+        :param dict config: Application configuration dictionary.
+        """
+        cls.track_points = config.get("track-points", 30)
+        cls.track_tolerance = config.get("track-tolerance", 0.0)
+        cls.search_track_points = config.get("search-track-points")
 
     def get_elasticsearch_geojson(self):
         """
@@ -78,9 +107,13 @@ class GeoJSONGenerator(object):
                     }
                 }
             elif self.shape_type == "track" or self.shape_type is None:
+                if self.search_track_points:
+                    search = self._gen_track(self.search_track_points)
+                else:
+                    search = self._gen_envelope()
                 geojson = {
                     "geometries": {
-                        "search": self._gen_envelope(),
+                        "search": search,
                         "display": self._gen_track()
                     }
                 }
@@ -117,38 +150,39 @@ class GeoJSONGenerator(object):
 
         return (lons, lats)
 
-    def _sanitise_geometry(self, lons, lats):
+    def _sanitise_geometry(self, lons, lats, dtype=None):
         """
-        Sanitise geometry by removing any masked points.
-        :param lons:
-        :param lats:
-        :return: A tuple containing arrays of (lon, lat)
+        Sanitise geometry by removing any masked, NaN or out of range points.
+
+        The validity mask is built once, in place, and applied to both
+        arrays, which are stored as plain (unmasked) arrays.
+
+        :param lons: Longitudes (array, masked array or list)
+        :param lats: Latitudes (array, masked array or list)
+        :param dtype: Data type to convert the coordinates to, or None to keep
+                      their own (e.g. to keep float32 coordinates float32)
         """
         # Align the arrays
         lons, lats = self.__align_lons_lats(lons, lats)
 
-        # Get masks
-        lon_mask = ma.getmaskarray(lons)
-        lat_mask = ma.getmaskarray(lats)
-
-        # Filter the arrays
-        self.longitudes = lons[
-            (lons >= -180) &
-            (lons <= 180) &
-            (lats >= -90) &
-            (lats <= 90) &
-            (lon_mask == False) &
-            (lat_mask == False)
-        ]
+        # The data and masks of masked arrays are views, not copies
+        lon_data = np.asarray(ma.getdata(lons), dtype=dtype)
+        lat_data = np.asarray(ma.getdata(lats), dtype=dtype)
 
-        self.latitudes = lats[
-            (lons >= -180) &
-            (lons <= 180) &
-            (lats >= -90) &
-            (lats <= 90) &
-            (lon_mask == False) &
-            (lat_mask == False)
-        ]
+        valid = np.greater_equal(lon_data, -180)
+        scratch = np.empty_like(valid)
+        for test, data, limit in ((np.less_equal, lon_data, 180),
+                                  (np.greater_equal, lat_data, -90),
+                                  (np.less_equal, lat_data, 90)):
+            np.logical_and(valid, test(data, limit, out=scratch), out=valid)
+
+        for mask in (ma.getmask(lons), ma.getmask(lats)):
+            if mask is not ma.nomask:
+                np.logical_and(valid, np.logical_not(mask, out=scratch),
+                               out=valid)
+
+        self.longitudes = lon_data[valid]
+        self.latitudes = lat_data[valid]
 
     def _gen_point(self):
         """
@@ -171,14 +205,9 @@ class GeoJSONGenerator(object):
         """
         # Just in case we don't have the same number of lats and lons we will use the lower
         # value to create a list of points
-        min_len = len(self.latitudes)
-        n_lons = len(self.longitudes)
-        
-        if n_lons < min_len: min_len = n_lons
-                
-        coordinates = [[self.longitudes[i], self.latitudes[i]] for i in range(n_lons)]
-        coordinates = [conditionPolygon(coordinates)]
-        
+        lons, lats = self.__align_lons_lats(self.longitudes, self.latitudes)
+        coordinates = [conditionPolygon(np.column_stack((lons, lats)))]
+
         polygon = {
             "type": "Polygon",
             "orientation": "counterclockwise",
@@ -208,39 +237,51 @@ class GeoJSONGenerator(object):
 
         return geojson
 
-    def _gen_track(self, num_points=30):
+    def _gen_track(self, num_points=None):
         """
-        Creates a LineString from a summary of the file's latitudes and
-        longitudes. Samples a coordinate every 'num_points'.
+        Creates a LineString from a simplified version of the file's track,
+        keeping the points that best preserve its shape.
 
-        :return: A GeoJSON LineString containing a sample of points from the
-                  flight track.
+        :param int num_points: Maximum number of points (default
+                               "track_points")
+        :return: A GeoJSON LineString containing at most 'num_points' points
+                 from the flight track.
         """
         track = {
             "type": "LineString"
         }
 
-        point_count = self._num_points(self.longitudes, self.latitudes)
-        if point_count <= num_points:
-            track_lons = self.longitudes
-            track_lats = self.latitudes
-        else:
-            step = int(math.ceil(point_count / num_points))
-            track_lons = self.longitudes[::step]
-            track_lats = self.latitudes[::step]
+        if num_points is None:
+            num_points = self.track_points
 
-        track["coordinates"] = list(zip(track_lons, track_lats))
+        lons, lats = self.__align_lons_lats(self.longitudes, self.latitudes)
+        keep = simplify_track(lons, lats, num_points, self.track_tolerance)
+        track["coordinates"] = list(zip(np.asarray(lons)[keep],
+                                        np.asarray(lats)[keep]))
 
         return track
 
+    def _all_bounds(self):
+        """
+        Return the bounds of the coordinates: those given at construction,
+        if any, otherwise those of self.longitudes and self.latitudes.
+
+        :return: Tuple of (lon left, lon right, lat bottom, lat top)
+        """
+        if self.bounds is not None:
+            lon_bounds, lat_bounds = self.bounds["lon"], self.bounds["lat"]
+        else:
+            lon_bounds = self._get_bounds(self.longitudes, wrapped_coords=True)
+            lat_bounds = self._get_bounds(self.latitudes)
+
+        return tuple(lon_bounds) + tuple(lat_bounds)
+
     def _gen_envelope(self):
         """
         Generate and return an Elasticsearch envelope type.
         :return: A bounding box as an envelope.
         """
-        lon_left, lon_right = self._get_bounds(self.longitudes,
-                                               wrapped_coords=True)
-        lat_bottom, lat_top = self._get_bounds(self.latitudes)
+        lon_left, lon_right, lat_bottom, lat_top = self._all_bounds()
 
         if not all((lon_left, lon_right, lat_bottom,lat_top)):
             return None
@@ -263,9 +304,7 @@ class GeoJSONGenerator(object):
 
         :return: A bounding-box formatted as GeoJSON
         """
-        lon_left, lon_right = self._get_bounds(self.longitudes,
-                                               wrapped_coords=True)
-        lat_bottom, lat_top = self._get_bounds(self.latitudes)
+        lon_left, lon_right, lat_bottom, lat_top = self._all_bounds()
 
         if (lon_left is None or lon_right is None or
                 lat_bottom is None or lat_top is None):
@@ -325,31 +364,126 @@ class GeoJSONGenerator(object):
             return items[0], items[0]
 
         if wrapped_coords:
-            if len(items) is 2:
-                first_bound_index = 0
-                second_bound_index = 1
+            if len(items) == 2:
+                first_bound, second_bound = items[0], items[1]
             else:
-                # find the largest angle between closest points and exclude
-                # this from the bounding box ensuring that this includes going
-                # across the zero line
-                items = sorted(items)
-                first_bound_index = 0
-                second_bound_index = len(items) - 1
-                max_diff = (items[first_bound_index] -
-                            items[second_bound_index]) % 360
-                for i in range(1, len(items)):
-                    diff = (items[i] - items[i-1]) % 360
-                    if diff > max_diff:
-                        max_diff = diff
-                        first_bound_index = i
-                        second_bound_index = i-1
-
-            first_bound = items[first_bound_index]
-            second_bound = items[second_bound_index]
+                first_bound, second_bound = GeoJSONGenerator._wrapped_bounds(
+                    np.unique(items))
+        else:
+            first_bound = np.min(items)
+            second_bound = np.max(items)
+
+        return float(first_bound), float(second_bound)
+
+    @staticmethod
+    def _wrapped_bounds(values):
+        """
+        Return the bounds of sorted, unique wrapped coordinates: the values
+        either side of the largest gap between neighbouring values (going
+        across the zero line), which is excluded from the bounding box.
+
+        Where gaps are equal, the first is used - with the gap across the
+        wrap (from the last value round to the first) counted first, so
+        that ties give the plain (min, max) bounds.
+
+        :param values: Sorted 1-D array of unique values
+        :return: Tuple of (first bound, second bound)
+        """
+        wrap_gap = (values[0] - values[-1]) % 360
+        if len(values) > 1:
+            gaps = np.diff(values) % 360
+            i = np.argmax(gaps)  # First of the largest
+            if gaps[i] > wrap_gap:
+                return values[i + 1], values[i]
+
+        return values[0], values[-1]
+
+
+class BoundsAccumulator(object):
+    """
+    Exact, mergeable accumulator for the bounds of coordinates that arrive in
+    chunks, or are split between processes: the bounds of all the values
+    added (or merged in) are those GeoJSONGenerator._get_bounds gives for
+    all the values at once.
+
+    Unwrapped coordinates only need their minimum and maximum. Wrapped
+    coordinates (e.g. longitude) keep their sorted unique values, as the
+    largest gap between them can be anywhere.
+    """
+    max_parts = 32  # Chunks of values held before they are combined
+
+    def __init__(self, wrapped_coords=False):
+        """
+        :param bool wrapped_coords: Coordinates wrap at 360 (e.g. longitude)
+        """
+        self.wrapped_coords = wrapped_coords
+        self.count = 0
+        self.first = []  # The first two values, in order
+        self.min = np.inf
+        self.max = -np.inf
+        self.parts = []  # Sorted unique values of each chunk, if wrapped
+
+    def update(self, item_list):
+        """
+        Add a chunk of (possibly masked) values.
+        """
+        items = ma.compressed(item_list).astype(float)
+        if len(items) == 0:
+            return
+
+        self.count += len(items)
+        if len(self.first) < 2:
+            self.first.extend(items[:2 - len(self.first)].tolist())
+
+        if self.wrapped_coords:
+            self._add_parts([np.unique(items)])
         else:
-            first_bound = min(items)
-            second_bound = max(items)
+            self.min = min(self.min, items.min())
+            self.max = max(self.max, items.max())
+
+    def merge(self, other):
+        """
+        Add the values accumulated by another BoundsAccumulator (e.g. one
+        from a later chunk, or another process) with the same settings.
+        """
+        self.count += other.count
+        self.first = (self.first + other.first)[:2]
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._add_parts(other.parts)
+
+    def _add_parts(self, parts):
+        self.parts.extend(parts)
+        if len(self.parts) > self.max_parts:
+            self.parts = [self._values()]
+
+    def _values(self):
+        """
+        Return the sorted unique values added, if wrapped.
+        """
+        if len(self.parts) == 1:
+            return self.parts[0]
+        return np.unique(np.concatenate(self.parts))
 
+    def bounds(self):
+        """
+        Return the bounds of all the values added, as
+        GeoJSONGenerator._get_bounds does.
+
+        :return: Tuple of (first bound, second bound), or (None, None)
+        """
+        if self.count == 0:
+            return None, None
+        if self.count == 1:
+            return self.first[0], self.first[0]
+
+        if not self.wrapped_coords:
+            return float(self.min), float(self.max)
+        if self.count == 2:
+            return tuple(self.first)
+
+        first_bound, second_bound = GeoJSONGenerator._wrapped_bounds(
+            self._values())
         return float(first_bound), float(second_bound)
 
 
@@ -392,11 +526,11 @@ class Properties(object):
             # Leave unchanged
             self.spatial = spatial
         else:
-            if "type" not in spatial:
-                gj = GeoJSONGenerator(spatial["lat"], spatial["lon"])
-            else:
-                gj = GeoJSONGenerator(spatial["lat"], spatial["lon"],
-                                      spatial["type"])
+            # "bounds" are given if "lat" and "lon" are a reduced set of
+            # the coordinates (see BoundsAccumulator)
+            gj = GeoJSONGenerator(spatial["lat"], spatial["lon"],
+                                  spatial.get("type"),
+                                  bounds=spatial.get("bounds"))
             self.spatial = gj.get_elasticsearch_geojson()
 
         self.misc = kwargs
@@ -415,7 +549,7 @@ class Properties(object):
 
         :returns: A Python string containing JSON representation of object.
         """
-        return json.dumps(self.properties, default=repr)
+        return dumps(self.properties)
 
     def as_json(self):
         """
@@ -0,0 +1,62 @@
+"""
+Module for reducing coordinate arrays that are too large to hold in memory
+to a much smaller set of points tracing the same path, one chunk at a time.
+"""
+
+import math
+
+import numpy as np
+
+
+class TrackReducer(object):
+    """
+    Accumulates (lat, lon) points chunk by chunk, keeping a decimated sample
+    of the track (every "stride"th point, and the last) for the display
+    geometry. The bounds of all the points are not kept - see
+    ceda_di.metadata.product.BoundsAccumulator.
+    """
+    def __init__(self, total_size, sample_size=1000):
+        """
+        :param int total_size: The number of points in the full arrays.
+        :param int sample_size: The approximate number of track points to sample.
+        """
+        self.stride = max(1, int(math.ceil(total_size / float(sample_size))))
+
+        # Sampled points, as lists of (lat, lon) arrays
+        self.samples = []
+        self.last = None  # (lat, lon) of the last point added
+
+    def update(self, index, lats, lons):
+        """
+        Add a chunk of valid points.
+
+        :param index: 1-D integer array of the points' positions in the full
+                      (flattened) arrays, in increasing order.
+        :param lats: 1-D array of latitudes.
+        :param lons: 1-D array of longitudes.
+        """
+        if len(index) == 0:
+            return
+
+        sampled = index % self.stride == 0
+        self.samples.append((lats[sampled], lons[sampled]))
+        self.last = (bool(sampled[-1]), lats[-1], lons[-1])
+
+    def result(self):
+        """
+        Return the sampled points in their original order.
+
+        :returns: Tuple of 1-D arrays (lats, lons)
+        """
+        lats = [s[0] for s in self.samples]
+        lons = [s[1] for s in self.samples]
+
+        # End the track where it really ends
+        if self.last is not None and not self.last[0]:
+            lats.append(np.array([self.last[1]]))
+            lons.append(np.array([self.last[2]]))
+
+        if not lats:
+            return np.empty(0), np.empty(0)
+
+        return np.concatenate(lats), np.concatenate(lons)
@@ -0,0 +1,82 @@
+"""
+Module for serialising metadata documents to JSON.
+
+Documents built from file contents are full of NumPy values - scalars,
+(masked) arrays and the masked constant - as well as datetimes. These are
+converted to their JSON equivalents (masked values, NaN and infinity
+become null), rather than to their repr.
+
+If orjson is installed it is used, as it is much faster on documents with
+many coordinates, otherwise the standard library json module is.
+"""
+
+import datetime
+import json
+import math
+
+import numpy as np
+import numpy.ma as ma
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    """
+    Convert a value that JSON can't represent directly.
+    """
+    if isinstance(obj, np.generic):  # Most common, so tested first
+        return obj.item()
+    if obj is ma.masked:
+        return None
+    if isinstance(obj, ma.MaskedArray):
+        values = obj.data.astype(object)
+        values[ma.getmaskarray(obj)] = None
+        return values.tolist()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return repr(obj)
+
+
+def _finite(obj):
+    """
+    Return a copy of a document with NaN and infinite values replaced by
+    None, as orjson does.
+    """
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return _finite(_default(obj))
+    return obj
+
+
+def _dumps_orjson(obj):
+    return orjson.dumps(obj, default=_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def dumps(obj):
+    """
+    Serialise a document to a JSON string.
+
+    :param obj: Document (dict, list, etc.) to serialise.
+    :returns: JSON string.
+    """
+    if orjson is not None:
+        try:
+            return _dumps_orjson(obj).decode("utf-8")
+        except TypeError:  # e.g. an integer too big for orjson
+            pass
+
+    try:
+        return json.dumps(obj, default=_default, allow_nan=False)
+    except ValueError:  # Only documents with NaN or infinity are copied
+        return json.dumps(_finite(obj), default=_default, allow_nan=False)
@@ -0,0 +1,80 @@
+"""
+Module for simplifying tracks (lines of (lon, lat) points) to a small
+number of vertices while keeping their shape - unlike sampling every Nth
+point, which can cut corners and miss the extremes of a track.
+"""
+
+import heapq
+
+import numpy as np
+
+# Distances below this (in degrees) are rounding errors, not detail
+MIN_DISTANCE = 1e-9
+
+
+def _farthest(x, y, first, last):
+    """
+    Find the point between "first" and "last" (exclusive) farthest from the
+    segment joining them.
+
+    :returns: Tuple of (index of the point, its distance from the segment)
+    """
+    px = x[first + 1:last] - x[first]
+    py = y[first + 1:last] - y[first]
+    dx = x[last] - x[first]
+    dy = y[last] - y[first]
+
+    seg2 = dx * dx + dy * dy
+    if seg2 > 0:
+        # Distance to the nearest point on the segment
+        t = np.clip((px * dx + py * dy) / seg2, 0, 1)
+        px -= t * dx
+        py -= t * dy
+    dist2 = px * px + py * py  # Or to the start, for a closed loop
+
+    i = np.argmax(dist2)
+    return first + 1 + i, float(np.sqrt(dist2[i]))
+
+
+def simplify_track(lons, lats, max_points=30, tolerance=0.0):
+    """
+    Simplify a track with the Douglas-Peucker algorithm, splitting the
+    segment that is furthest from the track first, so that stopping at
+    "max_points" vertices keeps the most significant ones.
+
+    Distances are in degrees, with the longitudes unwrapped so that tracks
+    crossing the dateline are measured the short way round.
+
+    :param lons: 1-D array of longitudes
+    :param lats: 1-D array of latitudes (the same length as "lons")
+    :param int max_points: Vertex budget (at least 2), or None for no limit
+    :param float tolerance: Stop once no point is further than this from
+                            the simplified track
+    :returns: Sorted 1-D array of the indices of the vertices to keep
+    """
+    n = len(lons)
+    if n <= 2:
+        return np.arange(n)
+
+    x = np.unwrap(np.asarray(lons, dtype=np.float64), period=360)
+    y = np.asarray(lats, dtype=np.float64)
+    tolerance = max(tolerance, MIN_DISTANCE)
+
+    # Segments still to split, as (-distance, first, last, farthest point)
+    segments = []
+
+    def add_segment(first, last):
+        if last - first > 1:
+            i, dist = _farthest(x, y, first, last)
+            if dist > tolerance:
+                heapq.heappush(segments, (-dist, first, last, i))
+
+    keep = [0, n - 1]
+    add_segment(0, n - 1)
+    while segments and (max_points is None or len(keep) < max_points):
+        _, first, last, i = heapq.heappop(segments)
+        keep.append(i)
+        add_segment(first, i)
+        add_segment(i, last)
+
+    return np.array(sorted(keep))
@@ -0,0 +1,174 @@
+"""
+Module containing the outputs ("sinks") that extracted metadata documents
+are sent to. Each file's document is serialised once, and the same string
+is passed to every configured sink.
+
+A sink has two methods:
+
+* ``write(filename, body)`` - output the JSON document "body" describing
+  the file "filename".
+* ``close()`` - flush anything still buffered.
+
+Sinks that write files take an "on_flush" callable, which is passed the
+names of the files whose documents have been written out, so that they can
+be recorded as processed only once their output is safe.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import socket
+
+
+def document_id(filename):
+    """
+    Return the Elasticsearch document ID for a file: the SHA-1 of its path,
+    so that re-extracted files replace their old document.
+
+    :param str filename: Path of the file the document describes.
+    """
+    return hashlib.sha1(filename.encode('utf-8')).hexdigest()
+
+
+class IndexSink(object):
+    """
+    Sends documents to Elasticsearch through a BulkIndexer.
+    """
+    def __init__(self, indexer):
+        """
+        :param indexer: The ceda_di.index.BulkIndexer to queue documents on.
+        """
+        self.indexer = indexer
+
+    def write(self, filename, body):
+        """
+        Queue a document for bulk indexing.
+
+        :param str filename: Path of the file the document describes.
+        :param str body: JSON document to index.
+        """
+        self.indexer.add_to_index_pool(body, doc_id=document_id(filename),
+                                       source=filename)
+
+    def close(self):
+        """
+        Submit any documents still pooled.
+        """
+        self.indexer.submit_pools()
+
+
+class JsonFileSink(object):
+    """
+    Writes each document to "<json_path>/<file basename>.json".
+    """
+    def __init__(self, json_path, on_flush=None):
+        """
+        :param str json_path: Directory to write the documents to.
+        :param on_flush: Optional callable taking a list of the files whose
+                         documents have been written.
+        """
+        self.json_path = json_path
+        self.on_flush = on_flush
+
+    def write(self, filename, body):
+        """
+        Write a document to its output file.
+
+        :param str filename: Path of the file the document describes.
+        :param str body: JSON document to write.
+        """
+        fname = os.path.basename(filename)
+        out_fname = f"{self.json_path}/{os.path.splitext(fname)[0]}.json"
+        with open(out_fname, 'w') as j:
+            j.write(body)
+
+        if self.on_flush is not None:
+            self.on_flush([filename])
+
+    def close(self):
+        pass
+
+
+class NdjsonSink(object):
+    """
+    Appends documents to newline-delimited JSON files in the Elasticsearch
+    bulk format (an action line followed by the document), ready to be
+    indexed with BulkIndexer.index_directory.
+
+    Each writer gets its own files, named "<host>-<pid>-<sequence>.ndjson",
+    so that concurrent jobs never write to the same file. A new file is
+    started once the current one holds "max_bytes" of (uncompressed) JSON.
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, compress=False,
+                 on_flush=None):
+        """
+        :param str directory: Directory to write the files to.
+        :param int max_bytes: Size at which to start a new file.
+        :param bool compress: Compress the files with gzip.
+        :param on_flush: Optional callable taking a list of the files whose
+                         documents are in a file that has been closed.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.on_flush = on_flush
+        self.unflushed = []  # Files with documents in the open file
+        self.prefix = "%s-%d" % (socket.gethostname(), os.getpid())
+
+        self.sequence = 0
+        self.file = None
+        self.bytes_written = 0
+
+    def _open_next(self):
+        """
+        Open the next unused file in the sequence.
+        """
+        while True:
+            self.sequence += 1
+            fname = "%s-%05d.ndjson" % (self.prefix, self.sequence)
+            if self.compress:
+                fname += ".gz"
+
+            path = os.path.join(self.directory, fname)
+            try:
+                # Exclusive creation - never append to another run's file
+                if self.compress:
+                    self.file = gzip.open(path, "xt", encoding="utf-8")
+                else:
+                    self.file = open(path, "x", encoding="utf-8")
+            except FileExistsError:
+                continue
+
+            self.bytes_written = 0
+            return
+
+    def write(self, filename, body):
+        """
+        Append a document to the current file.
+
+        :param str filename: Path of the file the document describes.
+        :param str body: JSON document (on a single line) to write.
+        """
+        if self.file is None:
+            self._open_next()
+
+        action = json.dumps({"index": {"_id": document_id(filename)}})
+        self.file.write(action + "\n" + body + "\n")
+        self.bytes_written += len(action) + len(body) + 2
+        self.unflushed.append(filename)
+
+        if self.bytes_written >= self.max_bytes:
+            self.close()
+
+    def close(self):
+        """
+        Close the current file.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+            flushed, self.unflushed = self.unflushed, []
+            if self.on_flush is not None:
+                self.on_flush(flushed)
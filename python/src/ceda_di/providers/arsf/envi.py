@@ -25,12 +25,32 @@ class ENVI(_geospatial):
 
     def _load_data(self):
         """
-        Load data from the binary file into a class attribute "data"
+        Map the binary file's data (indexed [band][line][sample]) into a
+        class attribute "data". Values are only read from the file when used.
         """
         if self.data is None:
             self.parameters = self.b.hdr
             self.data = self.b.read()
 
+    def _band(self, index, lines=None):
+        """
+        Return one band of a navigation file, which has one value (sample)
+        per line. Only the band (and lines) asked for are read from the file.
+
+        :param int index: Index of the band
+        :param lines: Slice or list of indexes of lines (default all)
+        :returns: 1-D array of the band's value for each line
+        """
+        return self.b.read(bands=index, lines=lines)[:, 0]
+
+    def _close_data(self):
+        """
+        Release the mapped data.
+        """
+        self.data = None
+        if self.b is not None:
+            self.b.close()
+
     def get_parameters(self):
         """
         Return a list of Parameter objects containing parameter information.
@@ -51,12 +71,12 @@ class ENVI(_geospatial):
         """
         spatial = {
             "type": "track",
-            "lat": self.data[1],
-            "lon": self.data[2],
-            "alt": self.data[3],
-            "roll": self.data[4],
-            "pitch": self.data[5],
-            "heading": self.data[6]
+            "lat": self._band(1),
+            "lon": self._band(2),
+            "alt": self._band(3),
+            "roll": self._band(4),
+            "pitch": self._band(5),
+            "heading": self._band(6)
         }
 
         return spatial
@@ -67,9 +87,10 @@ class ENVI(_geospatial):
 
         :returns: A dict containing temporal data.
         """
+        times = self._band(0, lines=[0, -1])
         temporal = {
-            "start_time": self.data[0][0],
-            "end_time": self.data[0][-1],
+            "start_time": times[0],
+            "end_time": times[-1],
         }
 
         return temporal
@@ -132,7 +153,7 @@ class BIL(ENVI):
         return self
 
     def __exit__(self, *args):
-        pass
+        self._close_data()
 
     def read(self):
         """
@@ -165,7 +186,7 @@ class BSQ(ENVI):
         return self
 
     def __exit__(self, *args):
-        pass
+        self._close_data()
 
     def read(self):
         """
@@ -4,6 +4,7 @@ Interface to extract and generate JSON from HDF4 EUFAR metadata
 
 import datetime
 
+import numpy as np
 from pyhdf.HDF import HDF
 from pyhdf.VS import VS
 from pyhdf.V import V
@@ -21,6 +22,7 @@ class HDF4(_geospatial):
     hdf = None
     vs = None
     v = None
+    vgroups = None
 
     def __init__(self, fname):
         """
@@ -37,6 +39,7 @@ class HDF4(_geospatial):
         self.hdf = HDF(self.fname)
         self.vs = self.hdf.vstart()
         self.v = self.hdf.vgstart()
+        self.vgroups = self._index_vgroups(self.v)
 
         return self
 
@@ -48,9 +51,59 @@ class HDF4(_geospatial):
         self.vs.end()
         self.hdf.close()
 
+    @staticmethod
+    def _index_vgroups(v):
+        """
+        Walk through the file's vgroups once, recording their refs by name.
+
+        :param HDF4.V.V v: Vgroup interface of an open file
+        :returns: Dict of vgroup name to ref (the first, if names repeat)
+        """
+        vgroups = {}
+        ref = -1
+        while True:
+            try:
+                ref = v.getid(ref)
+                vg = v.attach(ref)
+            except HDF4Error:  # End of file
+                # This is a weird way of handling files, but this is what the
+                # pyhdf library demonstrates...
+                break
+
+            vgroups.setdefault(vg._name, ref)
+            vg.detach()
+
+        return vgroups
+
+    def get_vgroup_ref(self, name):
+        """
+        Return the ref of the named vgroup, or None if the file has none.
+
+        :param str name: Name of the vgroup, e.g. "Navigation"
+        """
+        return self.vgroups.get(name)
+
+    @staticmethod
+    def _read_field(vs, name):
+        """
+        Read the first field of every record in a VData, with a single read.
+
+        :param HDF4.V.vs vs: VData object
+        :param str name: Name of the VData
+        :returns: List of values, one per record.
+        """
+        vd = vs.attach(vs.find(name))
+        try:
+            nrecs = vd.inquire()[0]
+            records = vd.read(nRec=nrecs) if nrecs > 0 else []
+        finally:
+            vd.detach()
+
+        return [record[0] for record in records]
+
     def _get_coords(self, vs, fn):
         """
-        Iterate through vgroup and return a list of coordinates (if existing).
+        Return the coordinates from the navigation VData (if existing).
 
         :param HDF4.V.vs vs: VData object
         :param str fn: Path to the data file
@@ -63,19 +116,10 @@ class HDF4(_geospatial):
 
         coords = {}
         for k, v in mappings.items():
-            ref = vs.find(k)
-            vd = vs.attach(ref)
-
-            coords[v] = []
-            while True:
-                try:
-                    coord = float(vd.read()[0][0])
-                    coord /= 10**7
-                    coords[v].append(coord)
-                except HDF4Error:  # End of file
-                    break
+            # Stored as integers in units of 1e-7 degrees
+            values = np.asarray(self._read_field(vs, k), dtype=np.float64)
+            coords[v] = values / 10**7
 
-            vd.detach()
         return coords
 
     def _get_temporal(self, vs, fn):
@@ -94,17 +138,7 @@ class HDF4(_geospatial):
 
         timestamps = {}
         for k, v in mappings.items():
-            ref = vs.find(k)
-            vd = vs.attach(ref)
-
-            timestamps[v] = []
-            while True:
-                try:
-                    timestamps[v].append(vd.read()[0][0])
-                except HDF4Error:  # EOF
-                    break
-
-            vd.detach()
+            timestamps[v] = self._read_field(vs, k)
 
         # This list comprehension basically converts from a list of integers
         # into a list of chars and joins them together to make strings
@@ -141,56 +175,28 @@ class HDF4(_geospatial):
 
     def get_geospatial(self):
         """
-        Search through HDF4 file, returning a list of coordinates from the
-        'Navigation' vgroup (if it exists).
+        Return a list of coordinates from the 'Navigation' vgroup (if it
+        exists).
 
         :returns: Dict containing geospatial information.
         """
-        ref = -1
-        while True:
-            try:
-                ref = self.v.getid(ref)
-                vg = self.v.attach(ref)
+        if self.get_vgroup_ref("Navigation") is None:
+            return None
 
-                if vg._name == "Navigation":
-                    geospatial = self._get_coords(self.vs, self.fname)
-                    geospatial["type"] = "track"  # Type annotation
-                    vg.detach()
-                    return geospatial
-
-                vg.detach()
-            except HDF4Error:  # End of file
-                # This is a weird way of handling files, but this is what the
-                # pyhdf library demonstrates...
-                break
-
-        return None
+        geospatial = self._get_coords(self.vs, self.fname)
+        geospatial["type"] = "track"  # Type annotation
+        return geospatial
 
     def get_temporal(self):
         """
-        Search through HDF4 file, returning timestamps from the 'Mission'
-        vgroup (if it exists)
+        Return timestamps from the 'Mission' vgroup (if it exists)
 
         :returns: List containing temporal metadata
         """
-        ref = -1
-        while True:
-            try:
-                ref = self.v.getid(ref)
-                vg = self.v.attach(ref)
-
-                if vg._name == "Mission":
-                    temporal = self._get_temporal(self.vs, self.fname)
-                    vg.detach()
-                    return temporal
-
-                vg.detach()
-            except HDF4Error:  # End of file
-                # This 'except at end of file' thing is some pyhdf weirdness
-                # Check the pyhdf documentation for clarification
-                break
+        if self.get_vgroup_ref("Mission") is None:
+            return None
 
-        return None
+        return self._get_temporal(self.vs, self.fname)
 
     def get_properties(self):
         """
@@ -10,13 +10,27 @@ class FAAMNetCDF(object):
     def __init__(self, fpath):
         self.fpath = fpath
         self.nc_from_fac = ceda_di.filetypes.netcdf.NetCDFFactory(fpath)
-        self.readme = self.get_readme(fpath)
+        try:
+            self.readme = self.get_readme(fpath)
+        except Exception:
+            self.nc_from_fac.close()
+            raise
+
+    @classmethod
+    def configure(cls, config):
+        """
+        Apply configuration options to the underlying NetCDF handlers.
+
+        :param dict config: Application configuration dictionary.
+        """
+        ceda_di.filetypes.netcdf.NetCDFFactory.configure(config)
 
     def __enter__(self):
         return self
 
     def __exit__(self, *args):
-        return None
+        # Close the NetCDF file opened by the factory
+        self.nc_from_fac.close()
 
     def get_readme(self, fpath):
         """
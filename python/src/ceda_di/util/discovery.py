@@ -0,0 +1,77 @@
+"""
+Module containing streaming file discovery for the extraction tools.
+"""
+
+import os
+import re
+
+
+# Paths matching any of these are skipped unless "exclude-patterns" is set
+DEFAULT_EXCLUDE_PATTERNS = ["raw"]
+
+
+def compile_patterns(patterns):
+    """
+    Combine a list of regular expressions into one compiled expression.
+
+    :param list patterns: Regular expression strings.
+    :returns: A compiled regular expression, or None if "patterns" is empty.
+    """
+    if not patterns:
+        return None
+
+    return re.compile("|".join("(?:%s)" % p for p in patterns))
+
+
+def walk_files(path, exclude=None, include=None, followlinks=True):
+    """
+    Lazily yield the path of every file beneath "path".
+
+    Directories are read with os.scandir one at a time and their files are
+    yielded straight away, so callers can start processing before the whole
+    tree has been visited. Directories whose path matches "exclude" are
+    pruned without being read.
+
+    :param str path: The directory to search.
+    :param exclude: Compiled regular expression - matching directories and
+                    files are skipped.
+    :param include: Callable taking a file path, returning False for files
+                    that should be skipped.
+    :param bool followlinks: Descend into symlinked directories.
+    :returns: A generator of file paths.
+    """
+    if exclude is not None and exclude.search(path):
+        return
+
+    seen = set()  # (device, inode) of visited directories - breaks symlink loops
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+
+        try:
+            stat = os.stat(directory)
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=followlinks)
+                    except OSError:
+                        is_dir = False
+
+                    if exclude is not None and exclude.search(entry.path):
+                        continue
+
+                    if is_dir:
+                        subdirs.append(entry.path)
+                    elif include is None or include(entry.path):
+                        yield entry.path
+        except OSError:
+            # Unreadable directories are skipped, as os.walk does
+            continue
+
+        # Reverse so that directories are visited in the order they were read
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,137 @@
+"""
+Module for recording extraction progress in a local SQLite database, so that
+unchanged files can be skipped and interrupted runs resumed.
+"""
+
+import datetime
+import os
+import sqlite3
+import threading
+
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+
+def file_signature(path):
+    """
+    Return the (size, mtime, inode) tuple used to detect changed files.
+
+    :param str path: Path to the file.
+    :returns: Tuple of (size in bytes, mtime in nanoseconds, inode number)
+    """
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class ExtractionState(object):
+    """
+    Context manager wrapping a SQLite database with one row per file seen.
+
+    Records are committed in batches of "commit_every", so at most that many
+    files are re-processed after an interrupted run. The connection may be
+    shared between threads (e.g. a pool's task feeder and the main thread).
+    """
+    def __init__(self, path, commit_every=500):
+        """
+        :param str path: Path to the SQLite database (created if missing).
+        :param int commit_every: Number of records to hold before committing.
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "inode INTEGER, handler TEXT, status TEXT, updated TEXT)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def is_current(self, path, signature):
+        """
+        Return True if "path" was processed successfully and has not changed.
+
+        :param str path: Path to the file.
+        :param tuple signature: The file's current signature (see file_signature)
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, inode, status FROM files WHERE path = ?",
+                (path,)).fetchone()
+
+        if row is None or row[3] != STATUS_OK:
+            return False
+
+        return tuple(row[:3]) == tuple(signature)
+
+    def filter_unchanged(self, paths):
+        """
+        Lazily drop paths that are already up to date in the database.
+
+        :param paths: Iterable of file paths.
+        :returns: A generator of the paths that need (re-)processing.
+        """
+        for path in paths:
+            try:
+                if self.is_current(path, file_signature(path)):
+                    continue
+            except OSError:
+                pass  # Let the handler report missing/unreadable files
+
+            yield path
+
+    def record(self, path, signature, handler, status):
+        """
+        Record the outcome of processing a file.
+
+        :param str path: Path to the file.
+        :param tuple signature: The file's signature before it was processed.
+        :param str handler: Name of the handler class used (or None).
+        :param str status: STATUS_OK, STATUS_FAILED or STATUS_TIMEOUT
+        """
+        size, mtime_ns, inode = signature
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, inode, handler, status,
+                 datetime.datetime.now().isoformat()))
+            self.pending += 1
+
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def mark_failed(self, path):
+        """
+        Mark an already recorded file as failed (e.g. if indexing it failed
+        after extraction), so that it is retried on the next run.
+
+        :param str path: Path to the file.
+        """
+        with self.lock:
+            self.conn.execute("UPDATE files SET status = ? WHERE path = ?",
+                              (STATUS_FAILED, path))
+            self.pending += 1
+
+    def commit(self):
+        """
+        Commit any outstanding records.
+        """
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+    def close(self):
+        """
+        Commit outstanding records and close the database.
+        """
+        self.commit()
+        self.conn.close()
@@ -0,0 +1,296 @@
+"""
+Module containing a process pool that enforces a time limit on each task.
+
+Unlike multiprocessing.Pool, a worker that runs over its task's time limit
+(e.g. blocked reading a file staged from tape, or spinning in a C library
+on a corrupt file) is killed and replaced, and the pool carries on with
+the remaining tasks. A worker that dies (e.g. from a segfault) is also
+replaced. If a worker's initializer raises, though, every worker would fail
+the same way, so the pool stops with that exception instead.
+"""
+
+import logging
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+
+class TaskTimeout(Exception):
+    """
+    A task ran for longer than its time limit, and its worker was killed.
+    """
+    def __init__(self, task, timeout):
+        super(TaskTimeout, self).__init__(
+            "Task %r timed out after %s seconds" % (task, timeout))
+        self.task = task
+        self.timeout = timeout
+
+    def __reduce__(self):
+        return (TaskTimeout, (self.task, self.timeout))
+
+
+class WorkerDied(Exception):
+    """
+    A worker process exited while running a task.
+    """
+    def __init__(self, task, exitcode):
+        super(WorkerDied, self).__init__(
+            "Worker died with exit code %s running task %r" % (exitcode, task))
+        self.task = task
+        self.exitcode = exitcode
+
+    def __reduce__(self):
+        return (WorkerDied, (self.task, self.exitcode))
+
+
+def _send(conn, succeeded, value):
+    """
+    Send a result to the pool. "succeeded" is None if the initializer failed.
+    """
+    try:
+        conn.send((succeeded, value))
+    except Exception as exc:  # e.g. the result can't be pickled
+        conn.send((None if succeeded is None else False,
+                   RuntimeError(repr(exc))))
+
+
+def _worker_main(conn, func, initializer, initargs):
+    """
+    Worker process: run "func" on each task received until told to stop.
+    """
+    if initializer is not None:
+        try:
+            initializer(*initargs)
+        except Exception as exc:
+            _send(conn, None, exc)
+            return
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return  # The pool has gone away
+        if task is None:
+            return
+
+        try:
+            result = (True, func(task))
+        except Exception as exc:
+            result = (False, exc)
+
+        _send(conn, *result)
+
+
+class _Worker(object):
+    """
+    The pool's view of one worker process.
+    """
+    def __init__(self, func, initializer, initargs):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, func, initializer, initargs),
+            daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.tasks_done = 0
+        self.index = None  # Position and value of the current task
+        self.task = None
+        self.timeout = None
+        self.deadline = None
+
+    @property
+    def busy(self):
+        return self.index is not None
+
+    def start(self, index, task, timeout):
+        self.index = index
+        self.task = task
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        try:
+            self.conn.send(task)
+        except OSError:  # e.g. BrokenPipeError
+            pass  # The worker has died - reported when its result is collected
+
+    def finish(self):
+        self.index = None
+        self.task = None
+        self.deadline = None
+        self.tasks_done += 1
+
+    def stop(self, grace=5):
+        """
+        Ask the worker to exit, killing it if it doesn't within "grace"
+        seconds.
+        """
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(grace)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self):
+        """
+        Kill the worker. A process that can't be killed straight away (e.g.
+        in uninterruptible I/O) is left to exit in its own time.
+        """
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class SupervisedPool(object):
+    """
+    Runs a function over a stream of tasks in a fixed number of worker
+    processes, each handling one task at a time.
+    """
+    def __init__(self, processes, func, initializer=None, initargs=(),
+                 max_tasks=None, timeout_for=None):
+        """
+        :param int processes: Number of worker processes.
+        :param func: Module level function run on each task in a worker.
+        :param initializer: Function run in each new worker.
+        :param tuple initargs: Arguments for "initializer".
+        :param int max_tasks: Replace each worker after this many tasks.
+        :param timeout_for: Callable returning the time limit in seconds for
+                            a task, or None for no limit.
+        """
+        self.processes = processes
+        self.func = func
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_tasks = max_tasks
+        self.timeout_for = timeout_for
+        self.logger = logging.getLogger(__name__)
+
+    def _spawn(self):
+        return _Worker(self.func, self.initializer, self.initargs)
+
+    def _collect(self, workers, ready):
+        """
+        Collect finished, timed out and dead workers' results, replacing
+        workers as needed.
+
+        :returns: List of (index, task, succeeded, result or exception)
+        :raises: The exception raised by a worker's initializer
+        """
+        results = []
+        now = time.monotonic()
+        for i, worker in enumerate(workers):
+            if not worker.busy:
+                continue
+
+            index, task = worker.index, worker.task
+            replace = False
+            if worker.conn in ready:
+                try:
+                    succeeded, value = worker.conn.recv()
+                except (EOFError, OSError):
+                    worker.process.join(1)
+                    succeeded = False
+                    value = WorkerDied(task, worker.process.exitcode)
+                    replace = True
+            elif worker.deadline is not None and now >= worker.deadline:
+                succeeded = False
+                value = TaskTimeout(task, worker.timeout)
+                replace = True
+            else:
+                continue  # Still running
+
+            if succeeded is None:  # The initializer failed
+                worker.kill()
+                raise value
+
+            if replace:
+                self.logger.error(str(value))
+                worker.kill()
+            else:
+                worker.finish()
+                if self.max_tasks and worker.tasks_done >= self.max_tasks:
+                    worker.stop()  # Recycle
+                    replace = True
+
+            if replace:
+                workers[i] = self._spawn()
+            results.append((index, task, succeeded, value))
+
+        return results
+
+    def imap(self, tasks, ordered=False):
+        """
+        Run the pool's function over "tasks", which are read lazily - only
+        as fast as workers become free.
+
+        Failures don't stop the pool: each is returned with its exception
+        (TaskTimeout for a task that ran too long, WorkerDied for a worker
+        that crashed, or whatever the function raised). If a worker's
+        initializer raises, the pool is stopped and the exception re-raised.
+
+        :param tasks: Iterable of (picklable) tasks.
+        :param bool ordered: Return results in the order of "tasks", rather
+                             than as they finish.
+        :returns: A generator of (task, succeeded, result or exception)
+        """
+        tasks = iter(tasks)
+        exhausted = False
+        next_index = 0
+
+        # Results waiting for earlier ones, when ordered
+        pending = {}
+        next_out = 0
+        max_pending = self.processes * 4
+
+        workers = [self._spawn() for _ in range(self.processes)]
+        try:
+            while True:
+                # Hand out tasks to idle workers
+                for i, worker in enumerate(workers):
+                    if exhausted:
+                        break
+                    if worker.busy or len(pending) >= max_pending:
+                        continue
+                    if not worker.process.is_alive():
+                        worker.kill()
+                        worker = workers[i] = self._spawn()
+
+                    try:
+                        task = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+
+                    timeout = self.timeout_for(task) if self.timeout_for else None
+                    worker.start(next_index, task, timeout)
+                    next_index += 1
+
+                busy = [w for w in workers if w.busy]
+                if not busy:
+                    break
+
+                # Wait for a result, or the next deadline
+                deadlines = [w.deadline for w in busy if w.deadline is not None]
+                wait_for = None
+                if deadlines:
+                    wait_for = max(0, min(deadlines) - time.monotonic())
+                ready = wait([w.conn for w in busy], timeout=wait_for)
+
+                for index, task, succeeded, value in self._collect(workers, ready):
+                    if not ordered:
+                        yield task, succeeded, value
+                        continue
+
+                    pending[index] = (task, succeeded, value)
+                    while next_out in pending:
+                        yield pending.pop(next_out)
+                        next_out += 1
+        finally:
+            for worker in workers:
+                if worker.busy:
+                    worker.kill()
+                else:
+                    worker.stop()
@@ -16,6 +16,8 @@ Options:
     --port=<port>              Specify ElasticSearch port.
     --index=<name>             Specify ElasticSearch index name.
     --file-list-file=<path>    File containing a list of file paths to scan (for extract).
+    --state-db=<path>          SQLite database of processed files (for extract).
+                               Unchanged files are skipped on later runs.
     --send-to-index            Index metadata with ElasticSearch.
     --no-create-files          Don't create JSON metadata files.
     --max-results=<num>        Max number of results to return when searching
@@ -42,9 +44,9 @@ from docopt import docopt
 
 import ceda_di.util.cmd as cmd
 from ceda_di import __version__  # Grab version from package __init__.py
-from ceda_di.extract import Extract
-from ceda_di.index import BulkIndexer
-from ceda_di.search import Searcher
+
+# The subcommands' modules are imported only when they are run, so that
+# e.g. "--version" and "search" don't import every data format library.
 
 
 def main():
@@ -57,6 +59,8 @@ def main():
     config = cmd.get_settings(conf_args["config"], conf_args)
 
     if conf_args["extract"]:
+        from ceda_di.extract import Extract
+
         file_list = None
         if 'file-list-file' in conf_args:
             with open(config['file-list-file']) as reader:
@@ -66,12 +70,16 @@ def main():
         extract.run()
 
     elif conf_args["index"]:
+        from ceda_di.index import BulkIndexer
+
         # Opening the BulkIndexer as a context manager ensures all docs get
         # submitted properly to the index (all pools get submitted)
         with BulkIndexer(config) as index:
             index.index_directory(config["path-to-json-docs"])
 
     elif conf_args["search"]:
+        from ceda_di.search import Searcher
+
         searcher = Searcher(config)
         searcher.run()
 
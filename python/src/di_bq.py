@@ -26,8 +26,9 @@ import os
 from docopt import docopt
 
 from ceda_di import __version__  # Grab version from package __init__.py
-from ceda_di.extract import Extract
+from ceda_di.extract import Extract, HandlerFactory
 import ceda_di.util.cmd as cmd
+from ceda_di.util import discovery
 
 
 def dump_to_json(output_directory, seq, file_list):
@@ -111,18 +112,22 @@ def main():
         max_files = int(args["num"])
         seq = 0
 
+        # Only list files that would be extracted
+        exclude = discovery.compile_patterns(
+            config.get("exclude-patterns", discovery.DEFAULT_EXCLUDE_PATTERNS))
+        handler_factory = HandlerFactory(config["handlers"])
+
         # Begin sweeping for files
         flist = []
-        for root, dirs, files in os.walk(path, followlinks=True):
-            for f in files:
-                fp = os.path.join(root, f)
-                flist.append(fp)
-
-                # Dump file paths to JSON document
-                if len(flist) >= max_files:
-                    dump_to_json(output_directory, seq, flist)
-                    seq += 1  # Increment file sequence number
-                    flist = []
+        for fp in discovery.walk_files(path, exclude=exclude,
+                                       include=handler_factory.matches):
+            flist.append(fp)
+
+            # Dump file paths to JSON document
+            if len(flist) >= max_files:
+                dump_to_json(output_directory, seq, flist)
+                seq += 1  # Increment file sequence number
+                flist = []
 
         # Dump anything left over to JSON
         dump_to_json(output_directory, seq, flist)
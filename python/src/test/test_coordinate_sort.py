@@ -0,0 +1,49 @@
+"""
+Test module for ceda_di.metadata.coordinate_sort
+"""
+
+import unittest
+
+from ceda_di.metadata.coordinate_sort import (ccw, conditionPolygon, condition_polygons,
+                                              filterDupes, onDateLine)
+
+
+class TestConditionPolygon(unittest.TestCase):
+    def test_GIVEN_counter_clockwise_polygon_THEN_only_closed(self):
+        square = [[0, 0], [1, 0], [1, 1], [0, 1]]
+
+        self.assertTrue(ccw(square))
+        self.assertListEqual(conditionPolygon(square),
+                             [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]])
+
+    def test_GIVEN_clockwise_polygon_THEN_sorted_counter_clockwise(self):
+        square = [[0, 0], [0, 1], [1, 1], [1, 0]]
+
+        self.assertFalse(ccw(square))
+        polygon = conditionPolygon(square)
+        self.assertTrue(ccw(polygon))
+        self.assertListEqual(polygon, [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]])
+
+    def test_GIVEN_runs_of_duplicates_THEN_all_removed(self):
+        coords = [[0, 0], [1, 0], [1, 0], [1, 0], [1, 0], [1, 1]]
+
+        self.assertListEqual(filterDupes(coords), [[0, 0], [1, 0], [1, 1]])
+
+    def test_GIVEN_polygon_across_dateline_THEN_returned_on_dateline(self):
+        square = [[179, 0], [179, 1], [-179, 1], [-179, 0]]
+
+        self.assertTrue(onDateLine(square))
+        self.assertListEqual(conditionPolygon(square),
+                             [[179, 0], [-179, 0], [-179, 1], [179, 1], [179, 0]])
+
+    def test_GIVEN_batch_THEN_same_as_one_at_a_time(self):
+        polygons = [
+            [[0, 0], [0, 1], [1, 1], [1, 0]],
+            [[10, 10], [12, 10], [11, 12]],
+            [[179, 0], [179, 1], [-179, 1], [-179, 0]],
+            [[5, 5], [5, 6], [6, 6], [6, 6], [6, 5]],
+            [],
+        ]
+
+        self.assertListEqual(condition_polygons(polygons),
+                             [conditionPolygon(p) if p else [] for p in polygons])
@@ -0,0 +1,60 @@
+"""
+Test module for ceda_di.util.discovery
+"""
+
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from ceda_di.util.discovery import compile_patterns, walk_files
+
+
+class TestWalkFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, "archive")
+
+        for directory in ["a", "a/b", "raw", "c/raw_data", "c/d"]:
+            os.makedirs(os.path.join(self.root, directory))
+
+        for fname in ["top.nc", "a/one.nc", "a/b/two.nc", "a/b/notes.txt",
+                      "raw/three.nc", "c/raw_data/four.nc", "c/d/five.nc"]:
+            open(os.path.join(self.root, fname), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _relative(self, paths):
+        return sorted(os.path.relpath(p, self.root) for p in paths)
+
+    def test_GIVEN_no_filters_WHEN_walk_THEN_all_files_found(self):
+        found = walk_files(self.root)
+
+        self.assertIsInstance(found, types.GeneratorType)
+        self.assertListEqual(self._relative(found), [
+            "a/b/notes.txt", "a/b/two.nc", "a/one.nc", "c/d/five.nc",
+            "c/raw_data/four.nc", "raw/three.nc", "top.nc"])
+
+    def test_GIVEN_exclude_WHEN_walk_THEN_matching_directories_pruned(self):
+        found = walk_files(self.root, exclude=compile_patterns(["raw"]))
+
+        self.assertListEqual(self._relative(found), [
+            "a/b/notes.txt", "a/b/two.nc", "a/one.nc", "c/d/five.nc",
+            "top.nc"])
+
+    def test_GIVEN_include_WHEN_walk_THEN_only_included_files_found(self):
+        found = walk_files(self.root, include=lambda p: p.endswith(".txt"))
+
+        self.assertListEqual(self._relative(found), ["a/b/notes.txt"])
+
+    def test_GIVEN_symlink_loop_WHEN_walk_THEN_each_directory_visited_once(self):
+        os.symlink(self.root, os.path.join(self.root, "a", "loop"))
+
+        found = self._relative(walk_files(self.root))
+
+        self.assertEqual(len(found), 7)
+
+    def test_GIVEN_no_patterns_WHEN_compile_THEN_none(self):
+        self.assertIsNone(compile_patterns([]))
@@ -2,8 +2,17 @@
 Test module for ceda_di.envi_geo
 """
 
+import os
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
+
+from mock import patch
+
+from ceda_di.filetypes.file_io import envi_io
+from ceda_di.filetypes.file_io.envi_io import parse_header, parse_header_cached, select
 from ceda_di.providers.arsf.envi import BIL
 from ceda_di.providers.arsf.envi import BSQ
 from ceda_di.providers.arsf.envi import ENVI
@@ -18,10 +27,13 @@ class ENVIStub(object):
         for k, val in kwargs.items():
             self.hdr[k] = val
 
-    def read(self):
-        # Returns 7x3 2-dimensional array of arbitrary data
-        return [["start_time", "end_time"], ["lat"], ["lon"],
-                ["alt"], ["roll"], ["pitch"], ["heading"]]
+    def read(self, bands=None, lines=None):
+        # Returns 7 bands x 2 lines x 1 sample: band number + line / 10
+        data = np.arange(7).reshape(7, 1, 1) + np.array([0.0, 0.1]).reshape(1, 2, 1)
+        return select(data, bands, lines)
+
+    def close(self):
+        pass
 
 
 class TestENVI(unittest.TestCase):
@@ -45,8 +57,8 @@ class TestENVI(unittest.TestCase):
         envi._load_data()
 
         geosp = envi.get_geospatial()
-        assert geosp["lat"] == ["lat"]
-        assert geosp["lon"] == ["lon"]
+        assert geosp["lat"].tolist() == [1.0, 1.1]
+        assert geosp["lon"].tolist() == [2.0, 2.1]
 
     def test_get_temporal(self):
         envi = ENVI(self.path, path=self.path)
@@ -54,5 +66,131 @@ class TestENVI(unittest.TestCase):
         envi._load_data()
 
         temporal = envi.get_temporal()
-        assert temporal["start_time"] == "start_time"
-        assert temporal["end_time"] == "end_time"
+        assert temporal["start_time"] == 0.0
+        assert temporal["end_time"] == 0.1
+
+
+class TestENVIFiles(unittest.TestCase):
+    """Test reading real BIL and BSQ files"""
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+        # 7 bands x 5 lines x 1 sample: band number * 100 + line
+        self.data = (np.arange(7).reshape(7, 1, 1) * 100 +
+                     np.arange(5).reshape(1, 5, 1)).astype("<f8")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write(self, name, layout):
+        """
+        Write the test data to "name" with its header, and return the
+        header path.
+        """
+        header = os.path.join(self.tmp, name + ".hdr")
+        with open(header, "w") as hdr:
+            hdr.write("ENVI\nsamples = 1\nlines = 5\nbands = 7\n"
+                      "band names = {time, lat, lon, alt, roll, pitch, heading}\n")
+        with open(os.path.join(self.tmp, name), "wb") as data:
+            data.write(layout.tobytes())
+        return header
+
+    def check(self, envi):
+        with envi:
+            np.testing.assert_array_equal(envi.data, self.data)
+            self.assertListEqual(envi.get_geospatial()["lat"].tolist(),
+                                 [100, 101, 102, 103, 104])
+            self.assertEqual(envi.get_temporal(),
+                             {"start_time": 0, "end_time": 4})
+        self.assertIsNone(envi.data)
+        self.assertIsNone(envi.b.memmap)
+
+    def test_GIVEN_bil_file_THEN_bands_read_by_line(self):
+        header = self.write("nav.bil", self.data.transpose(1, 0, 2))
+        self.check(BIL(header))
+
+    def test_GIVEN_bsq_file_THEN_bands_read_in_sequence(self):
+        header = self.write("nav.bsq", self.data)
+        self.check(BSQ(header))
+
+    def test_GIVEN_data_type_in_header_THEN_used_to_read_file(self):
+        header = self.write("nav.bsq", self.data.astype(">f4"))
+        with open(header, "a") as hdr:
+            hdr.write("data type = 4\nbyte order = 1\n")
+
+        self.check(BSQ(header))
+
+    def test_GIVEN_mixed_case_keys_THEN_layout_read_and_keys_kept(self):
+        header = self.write("nav.bsq", self.data.astype(">f4"))
+        with open(header, "a") as hdr:
+            hdr.write("Data Type = 4\nByte Order = 1\nINTERLEAVE = bsq\n")
+
+        envi = BIL(header)
+        self.check(envi)
+        self.assertIn("Data Type", envi.parameters)
+        self.assertNotIn("data type", envi.parameters)
+
+    def test_GIVEN_bands_and_lines_THEN_only_those_selected(self):
+        for name, layout in (("nav.bil", self.data.transpose(1, 0, 2)),
+                             ("nav.bsq", self.data)):
+            envi = (BIL if name.endswith("bil") else BSQ)(self.write(name, layout))
+            with envi:
+                self.assertListEqual(envi.b.read(bands=0, lines=[0, -1])[:, 0].tolist(),
+                                     [0, 4])
+                self.assertListEqual(envi.b.read(bands=[1, 2], lines=slice(1, 3))[..., 0].tolist(),
+                                     [[101, 102], [201, 202]])
+                self.assertListEqual(envi.b.read(bands=[1, 2], lines=[4])[..., 0].tolist(),
+                                     [[104], [204]])
+
+    def test_GIVEN_header_offset_and_interleave_THEN_used_to_read_file(self):
+        # A BSQ layout behind a 16 byte header, named like a BIL file
+        header = self.write("nav.bil", self.data)
+        with open(header.replace(".hdr", ""), "r+b") as data:
+            layout = data.read()
+            data.seek(0)
+            data.write(b"x" * 16 + layout)
+        with open(header, "a") as hdr:
+            hdr.write("interleave = bsq\nheader offset = 16\n")
+
+        self.check(BIL(header))
+
+
+class TestParseHeader(unittest.TestCase):
+    """Test parsing ENVI header text"""
+    header = ("ENVI\n"
+              "; A comment = not an entry\n"
+              "Samples = 1\n"
+              "lines   = 5\n"
+              "band names = {time, lat,\n"
+              "  lon, alt}\n"
+              "description = {Navigation data = post processed}\n")
+
+    def test_GIVEN_header_THEN_entries_parsed(self):
+        self.assertDictEqual(parse_header(self.header), {
+            "Samples": "1",
+            "lines": "5",
+            "band names": ["time", "lat", "lon", "alt"],
+            "description": "Navigation data = post processed",
+        })
+
+    def test_GIVEN_sibling_headers_WHEN_cached_THEN_only_changed_entries_parsed(self):
+        parse = envi_io._parse_header_entry
+        with patch.object(envi_io, "_entry_cache", envi_io.collections.OrderedDict()), \
+                patch.object(envi_io, "_parse_header_entry", side_effect=parse) as parser:
+            first = parse_header_cached(self.header, "/flight/line")
+            second = parse_header_cached(self.header.replace("lines   = 5", "lines = 6"),
+                                         "/flight/line")
+
+        self.assertEqual(parser.call_count, 5)
+        self.assertDictEqual(first, parse_header(self.header))
+        self.assertEqual(second["lines"], "6")
+        self.assertListEqual(first["band names"], second["band names"])
+        self.assertIsNot(first["band names"], second["band names"])
+
+    def test_GIVEN_many_directories_WHEN_cached_THEN_cache_bounded(self):
+        with patch.object(envi_io, "_entry_cache", envi_io.collections.OrderedDict()):
+            for i in range(envi_io.MAX_CACHED_DIRS + 10):
+                parse_header_cached(self.header, "/flight/line%d" % i)
+
+            self.assertEqual(len(envi_io._entry_cache), envi_io.MAX_CACHED_DIRS)
+            self.assertNotIn("/flight/line0", envi_io._entry_cache)
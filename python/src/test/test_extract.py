@@ -0,0 +1,223 @@
+"""
+Test module for ceda_di.extract.Extract
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from mock import patch
+
+from ceda_di.extract import Extract
+
+
+class EchoHandler(object):
+    """Handler stub whose properties are just the file's basename."""
+    def __init__(self, fname):
+        self.fname = fname
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def get_properties(self):
+        return '{"name": "%s"}' % os.path.basename(self.fname)
+
+
+class CountingHandler(EchoHandler):
+    """EchoHandler that counts how often its properties are evaluated."""
+    calls = 0
+
+    def get_properties(self):
+        CountingHandler.calls += 1
+        return super(CountingHandler, self).get_properties()
+
+
+class HangingHandler(EchoHandler):
+    """EchoHandler that never finishes extracting files named "hang*"."""
+    def get_properties(self):
+        if os.path.basename(self.fname).startswith("hang"):
+            time.sleep(600)
+        return super(HangingHandler, self).get_properties()
+
+
+class TestExtract(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp, "input")
+        os.makedirs(os.path.join(self.input_path, "raw"))
+
+        for i in range(10):
+            open(os.path.join(self.input_path, "file%d.echo" % i), "w").close()
+        open(os.path.join(self.input_path, "raw", "skipped.echo"), "w").close()
+
+        self.conf = {
+            "output-path": self.tmp,
+            "json-path": "json/",
+            "log-path": "log/",
+            "es-index": "ceda-di-testing",
+            "logging": {"format": "%(message)s"},
+            "input-path": self.input_path,
+            "no-create-files": False,
+            "send-to-index": False,
+            "handlers": {
+                r"\.echo$": {
+                    "class": "test.test_extract.EchoHandler",
+                    "priority": 10
+                }
+            }
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _json_output(self):
+        return sorted(os.listdir(os.path.join(self.tmp, "json")))
+
+    def test_GIVEN_one_core_WHEN_run_THEN_json_written_for_each_file(self):
+        Extract(self.conf).run()
+
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+
+    def test_GIVEN_several_cores_WHEN_run_THEN_same_output_as_serial(self):
+        self.conf["num-cores"] = 3
+        self.conf["max-tasks-per-child"] = 2
+        Extract(self.conf).run()
+
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+
+    def test_GIVEN_ordered_results_WHEN_run_parallel_THEN_results_in_input_order(self):
+        self.conf["ordered-results"] = True
+        extract = Extract(self.conf, file_list=[])
+        handled = []
+        extract.handle_result = lambda fname, body: handled.append(fname)
+
+        paths = [os.path.join(self.input_path, "file%d.echo" % i)
+                 for i in range(10)]
+        extract.run_parallel(iter(paths), 3)
+
+        self.assertListEqual(handled, paths)
+
+    def test_GIVEN_state_db_WHEN_run_twice_THEN_unchanged_files_skipped(self):
+        self.conf["state-db"] = "state.sqlite"
+        Extract(self.conf).run()
+
+        # Modify one file and remove all output
+        shutil.rmtree(os.path.join(self.tmp, "json"))
+        os.makedirs(os.path.join(self.tmp, "json"))
+        with open(os.path.join(self.input_path, "file3.echo"), "w") as f:
+            f.write("changed")
+
+        Extract(self.conf).run()
+
+        self.assertListEqual(self._json_output(), ["file3.json"])
+
+    def test_GIVEN_bad_handler_class_and_state_db_WHEN_run_THEN_files_not_recorded_as_done(self):
+        self.conf["state-db"] = "state.sqlite"
+        handler = self.conf["handlers"][r"\.echo$"]
+
+        for cores in (1, 2):
+            handler["class"] = "test.test_extract.MissingHandler"
+            self.conf["num-cores"] = cores
+            self.assertRaises(Exception, Extract(self.conf).run)
+
+            with sqlite3.connect(os.path.join(self.tmp, "state.sqlite")) as conn:
+                statuses = [row[0] for row in conn.execute("SELECT status FROM files")]
+            self.assertNotIn("ok", statuses)
+            self.assertIn("failed", statuses)
+
+        # Once the class can be imported, every file is extracted
+        handler["class"] = "test.test_extract.EchoHandler"
+        Extract(self.conf).run()
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+
+    def test_GIVEN_run_interrupted_before_flush_THEN_unflushed_files_not_recorded(self):
+        self.conf["state-db"] = "state.sqlite"
+        self.conf["output-format"] = "ndjson"
+        self.conf["ndjson-max-bytes"] = 300  # A new file every 4 documents
+
+        with patch.object(Extract, "close_sinks", side_effect=KeyboardInterrupt):
+            self.assertRaises(KeyboardInterrupt, Extract(self.conf).run)
+
+        with sqlite3.connect(os.path.join(self.tmp, "state.sqlite")) as conn:
+            done = conn.execute(
+                "SELECT COUNT(*) FROM files WHERE status = 'ok'").fetchone()[0]
+        self.assertEqual(done, 8)
+
+        # Only the files whose documents were lost are extracted again
+        extract = Extract(self.conf)
+        written = []
+        extract.write_result = lambda fname, *args: written.append(fname)
+        extract.run()
+        self.assertEqual(len(written), 2)
+
+    def test_GIVEN_send_to_index_WHEN_run_THEN_documents_bulk_indexed_with_source(self):
+        self.conf["send-to-index"] = True
+        self.conf["no-create-files"] = True
+
+        with patch("ceda_di.extract.index.BulkIndexer") as indexer_class:
+            Extract(self.conf).run()
+
+        indexer = indexer_class.return_value
+        sources = sorted(c[1]["source"]
+                         for c in indexer.add_to_index_pool.call_args_list)
+        self.assertListEqual(sources, sorted(
+            os.path.join(self.input_path, "file%d.echo" % i) for i in range(10)))
+        indexer.submit_pools.assert_called_once_with()
+
+    def test_GIVEN_index_and_files_enabled_WHEN_run_THEN_properties_evaluated_once_per_file(self):
+        self.conf["send-to-index"] = True
+        self.conf["handlers"][r"\.echo$"]["class"] = "test.test_extract.CountingHandler"
+        CountingHandler.calls = 0
+
+        with patch("ceda_di.extract.index.BulkIndexer") as indexer_class:
+            Extract(self.conf).run()
+
+        self.assertEqual(CountingHandler.calls, 10)
+        self.assertEqual(indexer_class.return_value.add_to_index_pool.call_count, 10)
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+
+    def test_GIVEN_pipeline_WHEN_run_parallel_THEN_all_documents_written(self):
+        self.conf["pipeline"] = True
+        self.conf["queue-size"] = 2
+        self.conf["num-cores"] = 2
+        Extract(self.conf).run()
+
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+
+    def test_GIVEN_pipeline_and_writer_fails_WHEN_run_THEN_error_raised(self):
+        self.conf["pipeline"] = True
+        self.conf["queue-size"] = 1
+        extract = Extract(self.conf)
+
+        def fail(fname, body):
+            raise IOError("disk full")
+        extract.handle_result = fail
+
+        self.assertRaises(IOError, extract.run)
+
+    def test_GIVEN_file_timeout_WHEN_handler_hangs_THEN_file_listed_for_retry(self):
+        hung = os.path.join(self.input_path, "hang.echo")
+        open(hung, "w").close()
+        self.conf["handlers"][r"\.echo$"]["class"] = "test.test_extract.HangingHandler"
+        self.conf["handlers"][r"\.echo$"]["timeout"] = 1
+        self.conf["state-db"] = "state.sqlite"
+
+        extract = Extract(self.conf)
+        extract.run()
+
+        self.assertListEqual(self._json_output(),
+                             sorted("file%d.json" % i for i in range(10)))
+        with open(extract.write_retry_list()) as f:
+            self.assertListEqual(json.load(f), [hung])
@@ -1,5 +1,7 @@
+import re
 from unittest import TestCase
-from ceda_di.extract import HandlerFactory
+from mock import patch
+from ceda_di.extract import HandlerFactory, _analyse_pattern
 from ceda_di.metadata.product import FileFormatError
 
 
@@ -24,7 +26,7 @@ class TestHandlerFactory(TestCase):
                 "priority": 10
             },
             ".*\.never$": {
-                "class": ".test.test_handler_factory.Never",
+                "class": "test.test_handler_factory.Never",
                 "priority": 1
             },
             ".*\.always$": {
@@ -61,12 +63,88 @@ class TestHandlerFactory(TestCase):
         handler = self.handler_factory.get_handler_class(filename)
         self.assertIsNone(handler)
 
+    def test_GIVEN_bad_class_path_WHEN_get_file_handler_class_THEN_import_error_raised(self):
+        factory = HandlerFactory({r"\.bad$": {
+            "class": "test.test_handler_factory.Missing",
+            "priority": 1}})
+
+        for _ in range(2):  # Not just the first time
+            self.assertRaises(ImportError, factory.get_handler_class, "file.bad")
+
+    def test_GIVEN_preload_THEN_handler_classes_imported(self):
+        factory = HandlerFactory({
+            r"\.conf$": {"class": "test.test_handler_factory.Configurable",
+                         "priority": 1},
+            r"\.bad$": {"class": "test.test_handler_factory.Missing",
+                        "priority": 1},
+            r"\.txt$": {"class": "None", "priority": 1}}, {"spam": "eggs"})
+        factory.preload()
+
+        self.assertIs(factory.handlers[r"\.conf$"]["class"], Configurable)
+        self.assertDictEqual(Configurable.config, {"spam": "eggs"})
+        self.assertIsNone(factory.handlers[r"\.txt$"]["class"])
+        self.assertRaises(ImportError, factory.get_handler_class, "file.bad")
+
     def test_GIVEN_always_WHEN_get_file_handler_class_THEN_always_returned(self):
 
         filename = 'blah.always'
         handler = self.handler_factory.get_handler_class(filename)
         self.assertEqual(handler.__name__,'Always')
 
+    def test_GIVEN_extension_only_pattern_WHEN_get_handler_class_twice_THEN_extension_memoised(self):
+        self.handler_factory.get_handler_class('first.hdf')
+        handler = self.handler_factory.get_handler_class('/other/dir/second.hdf')
+
+        self.assertEqual(handler.__name__, "HDF4")
+        self.assertIsNotNone(self.handler_factory._by_extension['.hdf'])
+
+    def test_GIVEN_config_WHEN_class_first_used_THEN_configured(self):
+        factory = HandlerFactory({r"\.conf$": {
+            "class": "test.test_handler_factory.Configurable",
+            "priority": 1}}, {"spam": "eggs"})
+
+        handler = factory.get_handler_class("file.conf")
+
+        self.assertDictEqual(handler.config, {"spam": "eggs"})
+
+    def test_GIVEN_unmatched_filename_WHEN_matches_THEN_false(self):
+        self.assertFalse(self.handler_factory.matches('notes.txt'))
+        self.assertTrue(self.handler_factory.matches('image.tif'))
+
+    def test_GIVEN_higher_priority_handler_added_WHEN_get_file_handler_class_THEN_new_handler_returned(self):
+        self.handler_factory.add_handler(r"\.tif$", Always, 0)
+
+        handler = self.handler_factory.get_handler_class('exif_file_test_name.tif')
+        self.assertEqual(handler.__name__, 'Always')
+
+
+class TestAnalysePattern(TestCase):
+    def test_GIVEN_extension_pattern_THEN_tail_and_prefix_found(self):
+        self.assertTupleEqual(_analyse_pattern(".nc$"), ("nc", 1))
+        self.assertTupleEqual(_analyse_pattern(r".*\.never$"), (".never", 0))
+
+    def test_GIVEN_pattern_with_stem_THEN_only_tail_found(self):
+        self.assertTupleEqual(_analyse_pattern("LT5.+_MTL.txt$"), ("txt", None))
+
+    def test_GIVEN_unanchored_pattern_THEN_nothing_found(self):
+        self.assertTupleEqual(_analyse_pattern("_CS_.*GRANULE"), (None, None))
+
+    def test_GIVEN_regex_parser_missing_THEN_nothing_found(self):
+        with patch("ceda_di.extract.sre_parse", None):
+            self.assertTupleEqual(_analyse_pattern(".nc$"), (None, None))
+
+    def test_GIVEN_regex_parser_fails_THEN_pattern_matched_in_full(self):
+        for error in (AttributeError("no parse"), IndexError(), re.error("bad")):
+            with patch("ceda_di.extract.sre_parse") as sre_parse:
+                sre_parse.parse.side_effect = error
+                self.assertTupleEqual(_analyse_pattern(".nc$"), (None, None))
+                factory = HandlerFactory({r"\.tif$": {
+                    "class": "ceda_di.providers.arsf.exif.EXIF",
+                    "priority": 10}}, {})
+
+            self.assertEqual(factory.get_handler_class("image.tif").__name__, "EXIF")
+            self.assertIsNone(factory.get_handler_class("image.tiff"))
+
 
 class Never():
     @staticmethod
@@ -78,3 +156,11 @@ class Always():
     @staticmethod
     def get_file_format(filename):
         return "Always"
+
+
+class Configurable():
+    config = None
+
+    @classmethod
+    def configure(cls, config):
+        cls.config = config
@@ -10,14 +10,18 @@ from ceda_di.providers.arsf.hdf4 import HDF4
 class StubAttachedVData(object):
     def __init__(self, read_data):
         self.count = 0
-        self.read_data = [read_data]
+        self.reads = 0
+        self.read_data = read_data
+
+    def inquire(self):
+        return len(self.read_data), 0, ["value"], 4, "stub"
 
-    def read(self):
-        self.count += 1
-        try:
-            return [self.read_data[0][self.count - 1]]
-        except IndexError:
+    def read(self, nRec=1):
+        self.reads += 1
+        if self.count + nRec > len(self.read_data):
             raise HDF4Error()
+        self.count += nRec
+        return self.read_data[self.count - nRec:self.count]
 
     def detach(self):
         pass
@@ -26,12 +30,38 @@ class StubAttachedVData(object):
 class StubVData(object):
     def __init__(self, read_data):
         self.read_data = read_data
+        self.attached = []
 
     def find(self, k):
         return k
 
     def attach(self, k):
-        return StubAttachedVData(self.read_data[k])
+        vd = StubAttachedVData(self.read_data[k])
+        self.attached.append(vd)
+        return vd
+
+
+class StubVGroup(object):
+    def __init__(self, name):
+        self._name = name
+
+    def detach(self):
+        pass
+
+
+class StubV(object):
+    def __init__(self, names):
+        self.names = names
+        self.attached = 0
+
+    def getid(self, ref):
+        if ref + 1 >= len(self.names):
+            raise HDF4Error()
+        return ref + 1
+
+    def attach(self, ref):
+        self.attached += 1
+        return StubVGroup(self.names[ref])
 
 
 class TestHDF4(unittest.TestCase):
@@ -47,10 +77,19 @@ class TestHDF4(unittest.TestCase):
         })
 
         coords = self.hdf._get_coords(m, self.path)
-        assert coords == {
-            "lat": [1.2345678],
-            "lon": [1.2345678]
-        }
+        assert coords["lat"].tolist() == [1.2345678]
+        assert coords["lon"].tolist() == [1.2345678]
+
+    def test_GIVEN_many_records_WHEN_get_coords_THEN_read_in_one_call(self):
+        m = StubVData({
+            "NVlat2": [[i * 10**6] for i in range(10000)],
+            "NVlng2": [[-i * 10**6] for i in range(10000)]
+        })
+
+        coords = self.hdf._get_coords(m, self.path)
+        self.assertEqual(coords["lat"][9999], 999.9)
+        self.assertEqual(coords["lon"][5], -0.5)
+        self.assertListEqual([vd.reads for vd in m.attached], [1, 1])
 
     def test_parse_timestamps_ddmmyyy(self):
         # Test dd/mm/yyyy format
@@ -101,3 +140,27 @@ class TestHDF4(unittest.TestCase):
             "start_time": "2010-07-19T10:04:19",
             "end_time": "2010-07-19T11:01:01",
         }
+
+    def test_GIVEN_vgroups_WHEN_indexed_THEN_first_ref_of_each_name_recorded(self):
+        v = StubV(["Mission", "Navigation", "Other", "Navigation"])
+
+        self.assertDictEqual(self.hdf._index_vgroups(v),
+                             {"Mission": 0, "Navigation": 1, "Other": 2})
+        self.assertEqual(v.attached, 4)
+
+    def test_GIVEN_no_navigation_vgroup_THEN_no_geospatial(self):
+        self.hdf.vgroups = self.hdf._index_vgroups(StubV(["Mission"]))
+        self.hdf.vs = StubVData({})
+
+        self.assertIsNone(self.hdf.get_geospatial())
+
+    def test_GIVEN_navigation_vgroup_THEN_geospatial_is_track(self):
+        self.hdf.vgroups = self.hdf._index_vgroups(StubV(["Navigation"]))
+        self.hdf.vs = StubVData({
+            "NVlat2": [[10**7]],
+            "NVlng2": [[2 * 10**7]]
+        })
+
+        geospatial = self.hdf.get_geospatial()
+        self.assertEqual(geospatial["type"], "track")
+        self.assertListEqual(geospatial["lon"].tolist(), [2.0])
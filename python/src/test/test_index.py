@@ -0,0 +1,93 @@
+"""
+Test module for ceda_di.index.BulkIndexer
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock, patch
+
+from ceda_di.index import BulkIndexer
+from ceda_di.output import NdjsonSink
+from elasticsearch import ElasticsearchException
+
+
+class TestBulkIndexer(unittest.TestCase):
+    def setUp(self):
+        self.es = MagicMock()
+        self.es.bulk.return_value = {"errors": False, "items": []}
+        config = {"es-index": "ceda-di-testing", "es-mapping": "geo_metadata"}
+
+        with patch("ceda_di.index.ElasticsearchClientFactory") as factory, \
+                patch("ceda_di.index.create_index"):
+            factory.get_client.return_value = self.es
+            self.config = config
+            self.errors = []
+            self.indexer = BulkIndexer(
+                config, threshold=3, max_bytes=100,
+                on_error=lambda source, err: self.errors.append((source, err)))
+
+    def test_GIVEN_fewer_docs_than_threshold_THEN_nothing_sent(self):
+        self.indexer.add_to_index_pool('{"a": 1}', doc_id="1", source="a.nc")
+        self.indexer.add_to_index_pool('{"b": 2}', doc_id="2", source="b.nc")
+
+        self.es.bulk.assert_not_called()
+
+    def test_GIVEN_count_threshold_reached_THEN_bulk_sent_with_ids(self):
+        for i in range(3):
+            self.indexer.add_to_index_pool('{"n": %d}' % i, doc_id=str(i))
+
+        docs = self.es.bulk.call_args[0][0]
+        self.assertListEqual(docs, [
+            {"index": {"_id": "0"}}, '{"n": 0}',
+            {"index": {"_id": "1"}}, '{"n": 1}',
+            {"index": {"_id": "2"}}, '{"n": 2}'])
+
+    def test_GIVEN_size_threshold_reached_THEN_bulk_sent(self):
+        self.indexer.add_to_index_pool(json.dumps({"spam": "x" * 100}))
+
+        self.assertEqual(self.es.bulk.call_count, 1)
+
+    def test_GIVEN_dict_document_THEN_serialised_before_sending(self):
+        self.indexer.add_to_index_pool({"spam": "eggs"})
+        self.indexer.submit_pools()
+
+        self.assertListEqual(self.es.bulk.call_args[0][0],
+                             [{"index": True}, '{"spam": "eggs"}'])
+
+    def test_GIVEN_item_errors_THEN_errors_mapped_to_sources(self):
+        self.es.bulk.return_value = {"errors": True, "items": [
+            {"index": {"_id": "1", "status": 201}},
+            {"index": {"_id": "2", "status": 400, "error": "bad geometry"}}
+        ]}
+        self.indexer.add_to_index_pool('{}', doc_id="1", source="good.nc")
+        self.indexer.add_to_index_pool('{}', doc_id="2", source="bad.nc")
+        self.indexer.submit_pools()
+
+        self.assertListEqual(self.errors, [("bad.nc", "bad geometry")])
+
+    def test_GIVEN_no_error_callback_WHEN_item_errors_THEN_raises(self):
+        self.es.bulk.return_value = {"errors": True, "items": []}
+        self.indexer.on_error = None
+        self.indexer.add_to_index_pool('{}')
+
+        self.assertRaises(ElasticsearchException, self.indexer.submit_pools)
+
+    def test_GIVEN_ndjson_files_WHEN_index_directory_THEN_lines_sent_unparsed(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            sink = NdjsonSink(tmp, compress=True)
+            for i in range(4):
+                sink.write("/data/file%d.nc" % i, '{"n": %d}' % i)
+            sink.close()
+
+            self.indexer.index_directory(tmp)
+        finally:
+            shutil.rmtree(tmp)
+
+        sent = [doc for call in self.es.bulk.call_args_list for doc in call[0][0]]
+        self.assertEqual(self.es.bulk.call_count, 2)  # threshold is 3
+        self.assertListEqual(sent[1::2], ['{"n": %d}' % i for i in range(4)])
+        self.assertTrue(all(isinstance(action, str) for action in sent[0::2]))
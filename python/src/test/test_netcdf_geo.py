@@ -2,9 +2,18 @@
 Test module for ceda_di.netcdf_geo
 """
 
+import collections
+import os
+import shutil
+import tempfile
 import unittest
 
-from ceda_di.filetypes.netcdf import NetCDF_Base
+import netCDF4
+import numpy
+from mock import patch
+
+from ceda_di.filetypes.netcdf import NetCDF_Base, NetCDFFactory, VariableIndex
+from ceda_di.metadata.product import GeoJSONGenerator
 
 
 class NetCDFStub(object):
@@ -59,6 +68,18 @@ class Test_NetCDF_Base(unittest.TestCase):
             }]
         }
 
+    def test_clean_coordinates(self):
+        coords = numpy.ma.masked_array([[1.5, 0.0, numpy.nan],
+                                        [numpy.inf, -3.0, 7.0]],
+                                       mask=[[0, 0, 0], [0, 0, 1]])
+
+        cleaned = NetCDF_Base.clean_coordinates(coords)
+
+        assert isinstance(cleaned, numpy.ndarray)
+        assert cleaned.tolist() == [1.5, -3.0]
+        assert cleaned.tolist() == list(filter(NetCDF_Base.clean_coordinate,
+                                               [1.5, 0.0, -3.0]))
+
     def test_find_var_by_standard_name(self):
         self.nc_stub.add_variable(
             "spam",
@@ -71,6 +92,29 @@ class Test_NetCDF_Base(unittest.TestCase):
             "spammity spam",
         ) == "spam"
 
+    def test_find_var_by_standard_name_falls_back_to_units(self):
+        self.nc_stub.add_variable("LAT_GIN", {"units": "degree_north"})
+
+        assert NetCDF_Base.find_var_by_standard_name(
+            self.nc_stub,
+            "/path/to/blergs",
+            "latitude",
+        ) == "LAT_GIN"
+
+    def test_GIVEN_name_match_and_units_match_THEN_name_preferred(self):
+        self.nc_stub.add_variable("LAT_GIN", {"units": "degree_north"})
+        self.nc_stub.add_variable("latitude", {})
+
+        assert NetCDF_Base.find_var_by_standard_name(
+            self.nc_stub, "/path/to/blergs", "latitude") == "latitude"
+
+    def test_GIVEN_several_units_matches_THEN_first_variable_used(self):
+        self.nc_stub.add_variable("LAT_GPS", {"units": "degrees_north"})
+        self.nc_stub.add_variable("LAT_GIN", {"units": "degree_north"})
+
+        assert NetCDF_Base.find_var_by_standard_name(
+            self.nc_stub, "/path/to/blergs", "latitude") == "LAT_GPS"
+
     def test_find_var_by_regex(self):
         self.nc_stub.add_variable(
             "spam",
@@ -81,3 +125,147 @@ class Test_NetCDF_Base(unittest.TestCase):
             self.nc_stub,
             "SPAM{1,3}"
         ) == "spam"
+
+
+class Test_NetCDFFactory(unittest.TestCase):
+    """
+    Test class for NetCDFFactory, using a small CF file on disk.
+    """
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fpath = os.path.join(self.tmp, "core_faam_20100419_r0_b500.nc")
+
+        with netCDF4.Dataset(self.fpath, "w") as ncdf:
+            ncdf.Conventions = "CF-1.6"
+            ncdf.createDimension("time", 5)
+            for name, standard_name, units in [
+                    ("time", "time", "seconds since 2010-04-19 00:00:00"),
+                    ("LAT", "latitude", "degree_north"),
+                    ("LON", "longitude", "degree_east")]:
+                var = ncdf.createVariable(name, "f8", ("time",))
+                var.standard_name = standard_name
+                var.units = units
+                var[:] = numpy.arange(1, 6)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_GIVEN_cf_file_WHEN_get_properties_THEN_file_opened_once_and_closed_on_exit(self):
+        with patch("ceda_di.filetypes.netcdf.netCDF4.Dataset",
+                   wraps=netCDF4.Dataset) as dataset:
+            with NetCDFFactory(self.fpath) as factory:
+                props = factory.get_properties()
+                ncdf = factory.ncdf
+
+        self.assertEqual(dataset.call_count, 1)
+        self.assertFalse(ncdf.isopen())
+        self.assertEqual(props.properties["temporal"]["start_time"],
+                         "2010-04-19T00:00:01")
+        self.assertEqual(props.properties["data_format"]["format"],
+                         "NetCDF/CF-1.6")
+
+    def test_GIVEN_memory_ceiling_WHEN_geospatial_THEN_chunked_reduction_keeps_bounds(self):
+        fpath = os.path.join(self.tmp, "swath.nc")
+        rng = numpy.random.default_rng(1)
+        with netCDF4.Dataset(fpath, "w") as ncdf:
+            ncdf.createDimension("y", 400)
+            ncdf.createDimension("x", 50)
+            for name, low, high in [("lat", -60, 75), ("lon", 150, 200)]:
+                var = ncdf.createVariable(name, "f4", ("y", "x"),
+                                          chunksizes=(16, 50))
+                values = rng.uniform(low, high, (400, 50))
+                if name == "lon":
+                    values = (values + 180) % 360 - 180  # Crosses the date line
+                var[:] = values
+
+        with netCDF4.Dataset(fpath) as ncdf:
+            full = NetCDF_Base.geospatial(ncdf, "lat", "lon")
+            with patch.object(NetCDF_Base, "max_coordinate_memory", 20000):
+                chunked = NetCDF_Base.geospatial(ncdf, "lat", "lon")
+
+        self.assertEqual(len(full["lat"]), 20000)
+        self.assertLess(len(chunked["lat"]), 2000)
+        for bounds in ("_gen_envelope", "_gen_bbox"):
+            self.assertEqual(
+                getattr(GeoJSONGenerator(full["lat"], full["lon"]), bounds)(),
+                getattr(GeoJSONGenerator(chunked["lat"], chunked["lon"],
+                                         bounds=chunked["bounds"]), bounds)())
+
+    def test_GIVEN_fill_values_at_ends_WHEN_temporal_THEN_first_and_last_valid_times(self):
+        fpath = os.path.join(self.tmp, "times.nc")
+        with netCDF4.Dataset(fpath, "w") as ncdf:
+            ncdf.createDimension("time", 1000)
+            ncdf.createDimension("obs", 4)
+            var = ncdf.createVariable("time", "f8", ("time",), fill_value=-1.0)
+            var.units = "seconds since 2010-04-19 00:00:00"
+            values = numpy.arange(1000.0)
+            values[:40] = -1.0
+            values[-3:] = -1.0
+            var[:] = values
+
+            unordered = ncdf.createVariable("obs_time", "f8", ("obs",))
+            unordered.units = "days since 2010-04-19 00:00:00"
+            unordered[:] = [3, 1, 4, 2]
+
+        with netCDF4.Dataset(fpath) as ncdf:
+            self.assertDictEqual(NetCDF_Base.temporal(ncdf, "time"), {
+                "start_time": "2010-04-19T00:00:40",
+                "end_time": "2010-04-19T00:16:36"})
+            self.assertDictEqual(NetCDF_Base.temporal(ncdf, "obs_time"), {
+                "start_time": "2010-04-20T00:00:00",
+                "end_time": "2010-04-23T00:00:00"})
+
+    def test_GIVEN_non_monotonic_time_coordinate_WHEN_temporal_THEN_min_and_max_used(self):
+        fpath = os.path.join(self.tmp, "reset.nc")
+        with netCDF4.Dataset(fpath, "w") as ncdf:
+            ncdf.createDimension("time", 1000)
+            var = ncdf.createVariable("time", "f8", ("time",))
+            var.units = "seconds since 2010-04-19 00:00:00"
+            values = numpy.arange(1000.0) + 100
+            values[500:] -= 550  # Clock reset half way through
+            var[:] = values
+
+        with netCDF4.Dataset(fpath) as ncdf:
+            self.assertDictEqual(NetCDF_Base.temporal(ncdf, "time"), {
+                "start_time": "2010-04-19T00:00:50",
+                "end_time": "2010-04-19T00:09:59"})
+
+    def test_GIVEN_files_with_same_signature_WHEN_variable_index_THEN_index_shared(self):
+        other = os.path.join(self.tmp, "core_faam_20100420_r0_b501.nc")
+        shutil.copy(self.fpath, other)
+
+        with netCDF4.Dataset(self.fpath) as first, netCDF4.Dataset(other) as second:
+            index = VariableIndex.for_dataset(first)
+            self.assertIs(VariableIndex.for_dataset(second), index)
+
+        self.assertEqual(index.find_by_standard_name("Latitude"), "LAT")
+        self.assertEqual(index.find_by_regex("^lo"), "LON")
+
+    def test_GIVEN_same_layout_different_attributes_WHEN_variable_index_THEN_own_attributes_used(self):
+        paths = []
+        for i, tagged in enumerate(["LAT", "LAT_GPS"]):
+            paths.append(os.path.join(self.tmp, "layout%d.nc" % i))
+            with netCDF4.Dataset(paths[-1], "w") as ncdf:
+                ncdf.createDimension("time", 2)
+                for name in ["LAT", "LAT_GPS"]:
+                    var = ncdf.createVariable(name, "f8", ("time",))
+                    if name == tagged:
+                        var.standard_name = "latitude"
+
+        for path, expected in zip(paths, ["LAT", "LAT_GPS"]):
+            with netCDF4.Dataset(path) as ncdf:
+                self.assertEqual(VariableIndex.for_dataset(ncdf).find_by_standard_name("latitude"),
+                                 expected)
+
+    def test_GIVEN_files_with_same_signature_WHEN_standard_name_missing_THEN_warned_once(self):
+        other = os.path.join(self.tmp, "core_faam_20100420_r0_b501.nc")
+        shutil.copy(self.fpath, other)
+
+        with patch.object(VariableIndex, "_cache", collections.OrderedDict()), \
+                self.assertLogs("ceda_di.filetypes.netcdf", level="DEBUG") as logs:
+            for path in (self.fpath, other):
+                with netCDF4.Dataset(path) as ncdf:
+                    NetCDF_Base.find_var_by_standard_name(ncdf, path, "altitude")
+
+        levels = [r.levelname for r in logs.records if "trying by regex" in r.getMessage()]
+        self.assertListEqual(levels, ["WARNING", "DEBUG"])
@@ -0,0 +1,83 @@
+"""
+Test module for ceda_di.output
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ceda_di.output import JsonFileSink, NdjsonSink, document_id
+
+
+class TestJsonFileSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_GIVEN_document_WHEN_write_THEN_file_named_after_basename(self):
+        JsonFileSink(self.tmp).write("/data/dir/file.nc", '{"a": 1}')
+
+        with open(os.path.join(self.tmp, "file.json")) as f:
+            self.assertEqual(f.read(), '{"a": 1}')
+
+
+class TestNdjsonSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_GIVEN_documents_WHEN_write_THEN_bulk_format_lines_written(self):
+        sink = NdjsonSink(self.tmp)
+        sink.write("/data/a/file.nc", '{"n": 1}')
+        sink.write("/data/b/file.nc", '{"n": 2}')
+        sink.close()
+
+        (fname,) = os.listdir(self.tmp)
+        with open(os.path.join(self.tmp, fname)) as f:
+            lines = f.read().splitlines()
+
+        self.assertListEqual(lines, [
+            json.dumps({"index": {"_id": document_id("/data/a/file.nc")}}),
+            '{"n": 1}',
+            json.dumps({"index": {"_id": document_id("/data/b/file.nc")}}),
+            '{"n": 2}'])
+
+    def test_GIVEN_max_bytes_reached_WHEN_write_THEN_new_file_started(self):
+        sink = NdjsonSink(self.tmp, max_bytes=100, compress=True)
+        for i in range(5):
+            sink.write("/data/file%d.nc" % i, json.dumps({"spam": "x" * 40}))
+        sink.close()
+
+        fnames = sorted(os.listdir(self.tmp))
+        self.assertEqual(len(fnames), 5)
+        self.assertTrue(all(f.endswith(".ndjson.gz") for f in fnames))
+        with gzip.open(os.path.join(self.tmp, fnames[0]), "rt") as f:
+            self.assertEqual(len(f.read().splitlines()), 2)
+
+    def test_GIVEN_existing_file_WHEN_write_THEN_not_overwritten(self):
+        first = NdjsonSink(self.tmp)
+        first.write("/data/file.nc", "{}")
+        first.close()
+
+        second = NdjsonSink(self.tmp)
+        second.write("/data/file.nc", "{}")
+        second.close()
+
+        self.assertEqual(len(os.listdir(self.tmp)), 2)
+
+    def test_GIVEN_on_flush_WHEN_file_closed_THEN_its_files_reported(self):
+        flushed = []
+        sink = NdjsonSink(self.tmp, on_flush=flushed.append)
+        sink.write("/data/a/file.nc", "{}")
+        sink.write("/data/b/file.nc", "{}")
+        self.assertListEqual(flushed, [])
+
+        sink.close()
+        self.assertListEqual(flushed, [["/data/a/file.nc", "/data/b/file.nc"]])
@@ -3,9 +3,11 @@ Test module for ceda_di.metadata.product
 """
 
 import unittest
+import numpy as np
 import numpy.ma as ma
 
-from ceda_di.metadata.product import Properties, Parameter, GeoJSONGenerator
+from ceda_di.metadata.product import Properties, Parameter, GeoJSONGenerator, \
+    BoundsAccumulator
 
 
 class TestProperties(unittest.TestCase):
@@ -267,3 +269,97 @@ class TestGeoJSONGenerator(unittest.TestCase):
 
         gen = GeoJSONGenerator(latitudes, longitudes)
         self.assertEqual(gen._num_points(longitudes, latitudes), 3)
+
+    def test_GIVEN_invalid_points_THEN_sanitised_geometry_drops_them_from_both(self):
+        longitudes = ma.masked_array(np.array([10, 200, 20, np.nan, 30, 40], dtype=np.float32),
+                                     mask=[0, 0, 0, 0, 1, 0])
+        latitudes = np.array([1, 2, 95, 4, 5, 6], dtype=np.float32)
+
+        gen = GeoJSONGenerator(latitudes, longitudes)
+        self.assertEqual(gen.longitudes.dtype, np.float32)
+        self.assertListEqual(gen.longitudes.tolist(), [10, 40])
+        self.assertListEqual(gen.latitudes.tolist(), [1, 6])
+
+        gen = GeoJSONGenerator(latitudes, longitudes, dtype=np.float64)
+        self.assertEqual(gen.longitudes.dtype, np.float64)
+
+
+class TestBounds(unittest.TestCase):
+    @staticmethod
+    def legacy_wrapped_bounds(items):
+        """
+        The original (pure Python) search for the largest gap.
+        """
+        items = sorted(items)
+        first, second = 0, len(items) - 1
+        max_diff = (items[first] - items[second]) % 360
+        for i in range(1, len(items)):
+            diff = (items[i] - items[i-1]) % 360
+            if diff > max_diff:
+                max_diff, first, second = diff, i, i-1
+        return float(items[first]), float(items[second])
+
+    def test_GIVEN_random_longitudes_THEN_wrapped_bounds_match_original(self):
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            lons = np.round(rng.uniform(-180, 180, rng.integers(3, 40)))
+            self.assertEqual(GeoJSONGenerator._get_bounds(lons, True),
+                             self.legacy_wrapped_bounds(lons))
+
+    def test_GIVEN_track_across_dateline_THEN_bounds_cross_dateline(self):
+        lons = [175, 178, 179.5, -179.5, -178, 175, -175]
+        self.assertEqual(GeoJSONGenerator._get_bounds(lons, True), (175, -175))
+
+    def test_GIVEN_chunks_WHEN_accumulated_and_merged_THEN_bounds_match_whole(self):
+        rng = np.random.default_rng(2)
+        lons = rng.uniform(-180, 180, 10000)
+        lons = ma.masked_array(lons, mask=rng.random(10000) < 0.1)
+
+        for wrapped in (True, False):
+            first = BoundsAccumulator(wrapped)
+            second = BoundsAccumulator(wrapped)
+            for start in range(0, 3000, 500):
+                first.update(lons[start:start + 500])
+            second.update(lons[3000:])
+            first.merge(second)
+            self.assertEqual(first.bounds(),
+                             GeoJSONGenerator._get_bounds(lons, wrapped))
+
+    def test_GIVEN_track_across_dateline_in_chunks_THEN_bounds_exact(self):
+        # The largest gap (between 100.01 and 100.02) is far narrower than
+        # a degree, and the track crosses the dateline in the second chunk
+        lons = np.concatenate([np.arange(100.02, 180, 0.01),
+                               np.arange(-180, 100.015, 0.01)])
+        whole = GeoJSONGenerator._get_bounds(lons, True)
+
+        chunks = []
+        for start in range(0, len(lons), 7000):
+            acc = BoundsAccumulator(True)
+            acc.update(lons[start:start + 7000])
+            chunks.append(acc)
+        merged = BoundsAccumulator(True)
+        for acc in reversed(chunks):  # Any order
+            merged.merge(acc)
+
+        self.assertEqual(merged.bounds(), whole)
+        self.assertAlmostEqual(whole[0], 100.02)
+        self.assertAlmostEqual(whole[1], 100.01, places=6)
+
+    def test_GIVEN_few_values_THEN_accumulated_bounds_match_get_bounds(self):
+        for values in ([], [5.0], [170.0, -170.0], [1.0, 2.0, 3.0]):
+            for wrapped in (True, False):
+                acc = BoundsAccumulator(wrapped)
+                for value in values:
+                    acc.update([value])
+                self.assertEqual(acc.bounds(),
+                                 GeoJSONGenerator._get_bounds(values, wrapped))
+
+    def test_GIVEN_bounds_WHEN_properties_THEN_envelope_uses_bounds(self):
+        props = Properties(spatial={
+            "type": "track",
+            "lat": [0.0, 1.0],
+            "lon": [0.0, 1.0],
+            "bounds": {"lat": (-5.0, 5.0), "lon": (170.0, -170.0)}})
+
+        self.assertEqual(props.spatial["geometries"]["search"]["coordinates"],
+                         [[170.0, 5.0], [-170.0, -5.0]])
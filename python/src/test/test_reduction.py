@@ -0,0 +1,35 @@
+"""
+Test module for ceda_di.metadata.reduction
+"""
+
+import unittest
+
+import numpy as np
+
+from ceda_di.metadata.reduction import TrackReducer
+
+
+class TestTrackReducer(unittest.TestCase):
+    def test_GIVEN_chunks_WHEN_reduced_THEN_track_sampled_in_order(self):
+        lats = np.linspace(-60, 60, 10000)
+        lons = np.linspace(100, 200, 10000)
+
+        reducer = TrackReducer(len(lons), sample_size=100)
+        for start in range(0, len(lons), 3000):
+            chunk = slice(start, start + 3000)
+            reducer.update(np.arange(len(lons))[chunk], lats[chunk], lons[chunk])
+        reduced_lats, reduced_lons = reducer.result()
+
+        self.assertEqual(len(reduced_lats), 101)
+        self.assertListEqual(reduced_lons.tolist(),
+                             lons[::100].tolist() + [lons[-1]])
+        self.assertListEqual(reduced_lats.tolist(),
+                             lats[::100].tolist() + [lats[-1]])
+
+    def test_GIVEN_no_points_THEN_result_is_empty(self):
+        reducer = TrackReducer(10)
+        reducer.update(np.empty(0, dtype=int), np.empty(0), np.empty(0))
+
+        lats, lons = reducer.result()
+        self.assertEqual(len(lats), 0)
+        self.assertEqual(len(lons), 0)
@@ -0,0 +1,75 @@
+"""
+Test module for ceda_di.metadata.serialise
+"""
+
+import datetime
+import json
+import unittest
+
+import numpy as np
+import numpy.ma as ma
+from mock import patch
+
+from ceda_di.metadata import serialise
+from ceda_di.metadata.product import Properties
+
+
+class TestSerialise(unittest.TestCase):
+    document = {
+        "scalar": np.float32(1.5),
+        "flag": np.bool_(True),
+        "count": np.int64(3),
+        "array": np.arange(3),
+        "masked_array": ma.masked_array([1.0, 2.0], mask=[False, True]),
+        "masked": ma.masked,
+        "time": datetime.datetime(2014, 9, 22, 20, 51, 53),
+        "track": [(np.float64(1.0), np.float32(2.5))],
+    }
+
+    expected = {
+        "scalar": 1.5,
+        "flag": True,
+        "count": 3,
+        "array": [0, 1, 2],
+        "masked_array": [1.0, None],
+        "masked": None,
+        "time": "2014-09-22T20:51:53",
+        "track": [[1.0, 2.5]],
+    }
+
+    def test_GIVEN_numpy_values_THEN_serialised_natively(self):
+        self.assertDictEqual(json.loads(serialise.dumps(self.document)),
+                             self.expected)
+
+    def test_GIVEN_no_orjson_THEN_same_document(self):
+        with patch.object(serialise, "orjson", None):
+            self.assertDictEqual(json.loads(serialise.dumps(self.document)),
+                                 self.expected)
+
+    def test_GIVEN_nan_and_infinity_WHEN_no_orjson_THEN_null_as_with_orjson(self):
+        document = {
+            "nan": float("nan"),
+            "inf": np.float32("inf"),
+            "array": np.array([1.0, -np.inf]),
+            "masked_array": ma.masked_array([np.nan, 2.0], mask=[False, True]),
+            "nested": [{"lat": np.float64("nan")}],
+        }
+        expected = {
+            "nan": None,
+            "inf": None,
+            "array": [1.0, None],
+            "masked_array": [None, None],
+            "nested": [{"lat": None}],
+        }
+
+        self.assertDictEqual(json.loads(serialise.dumps(document)), expected)
+        with patch.object(serialise, "orjson", None):
+            self.assertDictEqual(json.loads(serialise.dumps(document)), expected)
+
+    def test_GIVEN_float32_coordinates_THEN_properties_contain_numbers(self):
+        lats = np.array([1.5, 2.5], dtype=np.float32)
+        lons = np.array([3.5, 4.5], dtype=np.float32)
+        props = Properties(spatial={"lat": lats, "lon": lons})
+
+        display = json.loads(str(props))["spatial"]["geometries"]["display"]
+        self.assertListEqual(display["coordinates"], [[3.5, 1.5], [4.5, 2.5]])
@@ -0,0 +1,65 @@
+"""
+Test module for ceda_di.metadata.simplify
+"""
+
+import unittest
+
+import numpy as np
+
+from ceda_di.metadata.product import GeoJSONGenerator
+from ceda_di.metadata.simplify import simplify_track
+
+
+class TestSimplifyTrack(unittest.TestCase):
+    def test_GIVEN_two_points_THEN_both_kept(self):
+        self.assertListEqual(simplify_track([1, 2], [3, 4]).tolist(), [0, 1])
+
+    def test_GIVEN_straight_line_THEN_only_ends_kept(self):
+        lons = np.linspace(0, 10, 101)
+        lats = np.linspace(-5, 5, 101)
+
+        self.assertListEqual(simplify_track(lons, lats).tolist(), [0, 100])
+
+    def test_GIVEN_sharp_turn_between_samples_THEN_turn_kept(self):
+        # Out and back along the equator, turning at point 57
+        lons = np.concatenate((np.arange(58), np.arange(56, -1, -1)))
+        lats = np.zeros(len(lons))
+        lats[:58] = 0.001 * np.arange(58)
+
+        keep = simplify_track(lons, lats, max_points=3)
+        self.assertListEqual(keep.tolist(), [0, 57, len(lons) - 1])
+
+    def test_GIVEN_budget_THEN_at_most_budget_points_kept(self):
+        rng = np.random.default_rng(0)
+        lons = np.cumsum(rng.normal(size=10000))
+        lats = np.cumsum(rng.normal(size=10000))
+
+        keep = simplify_track(lons, lats, max_points=30)
+        self.assertEqual(len(keep), 30)
+        self.assertListEqual(keep.tolist(), sorted(set(keep.tolist())))
+
+    def test_GIVEN_tolerance_THEN_small_wiggles_dropped(self):
+        lons = np.linspace(0, 10, 11)
+        lats = np.array([0, 0.01, 0, -0.01, 0, 5, 0, 0.01, 0, 0, 0])
+
+        keep = simplify_track(lons, lats, max_points=None, tolerance=0.1)
+        self.assertListEqual(keep.tolist(), [0, 4, 5, 6, 10])
+
+    def test_GIVEN_track_across_dateline_THEN_measured_short_way_round(self):
+        lons = np.array([170, 175, 180, -175, -170])
+        lats = np.zeros(5)
+
+        self.assertListEqual(simplify_track(lons, lats).tolist(), [0, 4])
+
+
+class TestGeoJSONTrack(unittest.TestCase):
+    def test_GIVEN_search_track_points_THEN_search_geometry_is_track(self):
+        lons = np.linspace(0, 10, 100)
+        lats = np.sin(lons)
+        gen = GeoJSONGenerator(lats, lons, shape_type="track")
+        gen.search_track_points = 50
+
+        geometries = gen.get_elasticsearch_geojson()["geometries"]
+        self.assertEqual(geometries["search"]["type"], "LineString")
+        self.assertEqual(len(geometries["search"]["coordinates"]), 50)
+        self.assertEqual(len(geometries["display"]["coordinates"]), 30)
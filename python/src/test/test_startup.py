@@ -0,0 +1,75 @@
+"""
+Tests that the command line tools don't import the data format libraries
+until a file actually needs them.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_FILE = os.path.join(SRC_DIR, "../config/ceda-di-test.tmpl")
+
+# Modules only needed by particular handlers
+HANDLER_MODULES = ["netCDF4", "pyhdf", "exifread", "ceda_di.providers.arsf.hdf4",
+                   "ceda_di.providers.arsf.envi", "ceda_di.providers.arsf.exif"]
+
+
+def loaded_modules(code):
+    """
+    Run "code" in a fresh interpreter and return the names of the modules
+    it left imported.
+    """
+    script = code + "\nimport json, sys\nprint(json.dumps(sorted(sys.modules)))\n"
+    output = subprocess.check_output([sys.executable, "-c", script], cwd=SRC_DIR)
+    return set(json.loads(output.decode().splitlines()[-1]))
+
+
+class TestStartup(unittest.TestCase):
+    def assertNotImported(self, modules):
+        self.assertListEqual(sorted(set(HANDLER_MODULES) & modules), [])
+
+    def test_GIVEN_version_option_WHEN_di_run_THEN_no_handler_modules_imported(self):
+        modules = loaded_modules(
+            "import sys\n"
+            "sys.argv = ['di.py', '--version']\n"
+            "import di\n"
+            "try:\n"
+            "    di.main()\n"
+            "except SystemExit:\n"
+            "    pass\n")
+
+        self.assertNotIn("ceda_di.extract", modules)
+        self.assertNotImported(modules)
+
+    def test_GIVEN_handler_map_WHEN_factory_created_THEN_no_handler_modules_imported(self):
+        modules = loaded_modules(
+            "from ceda_di.util.cmd import read_conf\n"
+            "from ceda_di.extract import HandlerFactory\n"
+            "factory = HandlerFactory(read_conf(%r)['handlers'])\n"
+            "assert factory.matches('file.hdf')\n" % CONFIG_FILE)
+
+        self.assertNotImported(modules)
+
+    def test_GIVEN_searcher_WHEN_created_THEN_no_handler_modules_imported(self):
+        modules = loaded_modules(
+            "from ceda_di.util.cmd import read_conf\n"
+            "from ceda_di.search import Searcher\n"
+            "Searcher(read_conf(%r))\n" % CONFIG_FILE)
+
+        self.assertNotImported(modules)
+
+    def test_GIVEN_tif_file_WHEN_get_handler_class_THEN_only_its_handler_imported(self):
+        modules = loaded_modules(
+            "from ceda_di.util.cmd import read_conf\n"
+            "from ceda_di.extract import HandlerFactory\n"
+            "factory = HandlerFactory(read_conf(%r)['handlers'])\n"
+            "assert factory.get_handler_class('image.tif').__name__ == 'EXIF'\n"
+            % CONFIG_FILE)
+
+        self.assertIn("ceda_di.providers.arsf.exif", modules)
+        self.assertNotIn("ceda_di.providers.arsf.hdf4", modules)
+        self.assertNotIn("netCDF4", modules)
@@ -0,0 +1,64 @@
+"""
+Test module for ceda_di.util.state
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ceda_di.util.state import ExtractionState, file_signature, \
+    STATUS_OK, STATUS_FAILED
+
+
+class TestExtractionState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, "state.sqlite")
+        self.data_path = os.path.join(self.tmp, "data.nc")
+        with open(self.data_path, "w") as f:
+            f.write("spam")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_GIVEN_unrecorded_file_THEN_not_current(self):
+        with ExtractionState(self.db_path) as st:
+            self.assertFalse(st.is_current(self.data_path,
+                                           file_signature(self.data_path)))
+
+    def test_GIVEN_recorded_file_WHEN_reopened_THEN_current(self):
+        with ExtractionState(self.db_path) as st:
+            st.record(self.data_path, file_signature(self.data_path),
+                      "some.Handler", STATUS_OK)
+
+        with ExtractionState(self.db_path) as st:
+            self.assertTrue(st.is_current(self.data_path,
+                                          file_signature(self.data_path)))
+
+    def test_GIVEN_file_changed_since_recorded_THEN_not_current(self):
+        with ExtractionState(self.db_path) as st:
+            st.record(self.data_path, (1, 2, 3), "some.Handler", STATUS_OK)
+
+            self.assertFalse(st.is_current(self.data_path,
+                                           file_signature(self.data_path)))
+
+    def test_GIVEN_failed_file_THEN_not_current(self):
+        with ExtractionState(self.db_path) as st:
+            st.record(self.data_path, file_signature(self.data_path),
+                      "some.Handler", STATUS_FAILED)
+
+            self.assertFalse(st.is_current(self.data_path,
+                                           file_signature(self.data_path)))
+
+    def test_GIVEN_mixed_paths_WHEN_filter_unchanged_THEN_only_changed_returned(self):
+        other = os.path.join(self.tmp, "other.nc")
+        open(other, "w").close()
+
+        with ExtractionState(self.db_path) as st:
+            st.record(self.data_path, file_signature(self.data_path),
+                      "some.Handler", STATUS_OK)
+
+            remaining = list(st.filter_unchanged([self.data_path, other]))
+
+        self.assertListEqual(remaining, [other])
@@ -0,0 +1,84 @@
+"""
+Test module for ceda_di.util.supervisor
+"""
+
+import os
+import time
+import unittest
+
+from ceda_di.util.supervisor import SupervisedPool, TaskTimeout, WorkerDied
+
+
+def _run(task):
+    """Task function: sleep or crash as told, then return the worker's pid."""
+    if task == "hang":
+        time.sleep(600)
+    elif task == "crash":
+        os._exit(3)
+    elif task == "raise":
+        raise ValueError(task)
+    elif isinstance(task, float):
+        time.sleep(task)
+    return os.getpid()
+
+
+def _fail_init(how):
+    """Worker initializer: raise or crash as told."""
+    if how == "crash":
+        os._exit(3)
+    raise ValueError(how)
+
+
+class TestSupervisedPool(unittest.TestCase):
+    def test_GIVEN_hung_task_WHEN_timeout_passes_THEN_other_tasks_carry_on(self):
+        pool = SupervisedPool(2, _run, timeout_for=lambda task: 1)
+        start = time.monotonic()
+        results = list(pool.imap(["hang", "a", "b", "c"]))
+
+        self.assertLess(time.monotonic() - start, 30)
+        failed = [(t, r) for t, ok, r in results if not ok]
+        self.assertEqual(len(failed), 1)
+        self.assertEqual(failed[0][0], "hang")
+        self.assertIsInstance(failed[0][1], TaskTimeout)
+        self.assertEqual(sorted(t for t, ok, _ in results if ok), ["a", "b", "c"])
+
+    def test_GIVEN_worker_crashes_WHEN_imap_THEN_worker_replaced(self):
+        results = list(SupervisedPool(1, _run).imap(["crash", "a", "raise"]))
+
+        self.assertIsInstance(results[0][2], WorkerDied)
+        self.assertTrue(results[1][1])
+        self.assertIsInstance(results[2][2], ValueError)
+
+    def test_GIVEN_ordered_WHEN_tasks_finish_out_of_order_THEN_input_order_kept(self):
+        tasks = [0.5, 0.0, 0.2, 0.0]
+        results = list(SupervisedPool(3, _run).imap(tasks, ordered=True))
+
+        self.assertListEqual([t for t, _, _ in results], tasks)
+
+    def test_GIVEN_max_tasks_WHEN_imap_THEN_workers_recycled(self):
+        results = list(SupervisedPool(1, _run, max_tasks=2).imap(["a"] * 6))
+
+        self.assertEqual(len(set(pid for _, _, pid in results)), 3)
+
+    def test_GIVEN_initializer_raises_WHEN_imap_THEN_pool_stops_with_error(self):
+        pool = SupervisedPool(2, _run, initializer=_fail_init, initargs=("bad",))
+        start = time.monotonic()
+
+        with self.assertRaises(ValueError) as cm:
+            list(pool.imap(["a"] * 100))
+        self.assertEqual(str(cm.exception), "bad")
+        self.assertLess(time.monotonic() - start, 30)
+
+    def test_GIVEN_worker_dead_before_task_sent_WHEN_collected_THEN_worker_died(self):
+        pool = SupervisedPool(1, _run, initializer=_fail_init, initargs=("crash",))
+        workers = [pool._spawn()]
+        dead = workers[0]
+        dead.process.join()
+
+        dead.start(0, "a", None)
+        results = pool._collect(workers, [dead.conn])
+        workers[0].stop()
+
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], "a")
+        self.assertIsInstance(results[0][3], WorkerDied)